@@ -6,6 +6,12 @@ from pathlib import Path
 from typing import Dict, Any
 import logging
 
+# Prefer the LibYAML-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
 logger = logging.getLogger(__name__)
 
 class TrackingConfig:
@@ -19,6 +25,7 @@ class TrackingConfig:
             self.config_path = Path(config_path)
         
         self.config = self._load_config()
+        self._tracker_args, self._default_tracker_args = self._build_tracker_args()
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file"""
@@ -27,8 +34,8 @@ class TrackingConfig:
             return self._get_default_config()
         
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            # Parse one contiguous buffer instead of streaming small reads from the file
+            config = yaml.load(self.config_path.read_bytes(), Loader=_Loader)
             logger.info(f"✅ Loaded tracking config from: {self.config_path}")
             return config
         except Exception as e:
@@ -94,15 +101,16 @@ class TrackingConfig:
         Example:
             config.get('tracking.bytetrack.track_high_thresh', 0.5)
         """
-        keys = key_path.split('.')
         value = self.config
-        
-        for key in keys:
-            if isinstance(value, dict) and key in value:
+
+        # One subscript per level instead of an isinstance/`in` probe followed
+        # by a second lookup; missing keys and non-dict nodes both raise here
+        try:
+            for key in key_path.split('.'):
                 value = value[key]
-            else:
-                return default
-        
+        except (KeyError, TypeError):
+            return default
+
         return value
     
     @property
@@ -137,31 +145,29 @@ class TrackingConfig:
     def device(self) -> str:
         return self.get('hardware.device', 'cuda')
     
+    def _build_tracker_args(self):
+        """Build per-tracker argument dicts once from the loaded config"""
+        common = {
+            'persist': self.get('tracking.persist', True),
+            'conf': self.conf_threshold,
+            'iou': self.iou_threshold,
+        }
+        tracker_args = {
+            'bytetrack': {'tracker': 'bytetrack.yaml', **common},
+            'botsort': {'tracker': 'botsort.yaml', **common},
+        }
+        # Default tracker args
+        default_args = {
+            'persist': True,
+            'conf': self.conf_threshold,
+            'iou': self.iou_threshold,
+        }
+        return tracker_args, default_args
+    
     def get_tracker_args(self) -> Dict[str, Any]:
         """Get tracker-specific arguments"""
-        tracker = self.tracker_type
-        
-        if tracker == 'bytetrack':
-            return {
-                'tracker': 'bytetrack.yaml',
-                'persist': self.get('tracking.persist', True),
-                'conf': self.conf_threshold,
-                'iou': self.iou_threshold,
-            }
-        elif tracker == 'botsort':
-            return {
-                'tracker': 'botsort.yaml',
-                'persist': self.get('tracking.persist', True),
-                'conf': self.conf_threshold,
-                'iou': self.iou_threshold,
-            }
-        else:
-            # Default tracker args
-            return {
-                'persist': True,
-                'conf': self.conf_threshold,
-                'iou': self.iou_threshold,
-            }
+        # Copy so callers can't mutate the prebuilt dicts
+        return dict(self._tracker_args.get(self.tracker_type, self._default_tracker_args))
     
     def print_summary(self):
         """Print configuration summary"""
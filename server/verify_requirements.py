@@ -3,18 +3,34 @@
 Verify all requirements are installed correctly with GPU support
 """
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 
-def check_package(package_name, import_name=None):
-    """Check if a package is installed"""
-    if import_name is None:
-        import_name = package_name
+def is_installed(import_name):
+    """Locate a module without importing it
+
+    find_spec only resolves the module on disk, so heavy packages like torch
+    or ultralytics are not loaded just to be checked.
+    """
     try:
-        __import__(import_name)
+        return find_spec(import_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def report_package(package_name, installed):
+    """Print the check result for a package"""
+    if installed:
         print(f"✅ {package_name} installed")
-        return True
-    except ImportError:
+    else:
         print(f"❌ {package_name} NOT installed")
-        return False
+    return installed
+
+def check_packages(packages):
+    """Check (name, import_name) pairs concurrently, reporting in list order"""
+    # Lookups are filesystem-bound, so run them in parallel and print afterwards
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        found = list(ex.map(is_installed, [imp for _, imp in packages]))
+    return [report_package(name, ok) for (name, _), ok in zip(packages, found)]
 
 def check_gpu():
     """Check GPU availability"""
@@ -54,7 +70,7 @@ def main():
     ]
     
     print("\n📦 Checking packages...")
-    all_installed = all(check_package(name, imp) for name, imp in packages)
+    all_installed = all(check_packages(packages))
     
     print("\n🎮 Checking GPU support...")
     gpu_available = check_gpu()
@@ -75,6 +75,10 @@ C.MOT.REID_BATCHSIZE = 1
 # object detector (yolov5s, yolov5m, yolov5l, other yolov5 versions)
 C.MOT.DETECTOR = "yolov5l"
 
+# keep detector outputs on the detector's device (GPU) instead of copying them
+# to the CPU inside the detector wrapper; the caller does the single host copy
+C.MOT.DETECTOR_KEEP_DEVICE = False
+
 # classes that are kept from detection
 # only bike, car, motorbike, bus, truck classes are default (yolov5)
 C.MOT.TRACKED_CLASSES = [1, 2, 3, 5, 7]
@@ -203,6 +207,22 @@ C.LIVE.MIN_TRACK_FRAMES = 3
 # Seconds between live clustering runs (to accumulate a short window of evidence)
 C.LIVE.CLUSTER_INTERVAL = 0.5
 
+# Reuse a track's last ReID feature for at most this many frames (ticks)
+C.LIVE.REID_MAX_AGE = 5
+
+# Re-extract the ReID feature when the box changed by more than this (1 - IoU)
+# since the track's last extraction
+C.LIVE.REID_MAX_BOX_CHANGE = 0.05
+
+# Share one ReID extractor per device between cameras, batching the crops that
+# cameras submit within REID_BATCH_WINDOW_MS milliseconds into one inference
+C.LIVE.SHARED_REID = True
+C.LIVE.REID_BATCH_WINDOW_MS = 5.0
+
+# Decode video files with PyAV through this hardware decoder, e.g. "cuda" for
+# NVDEC (needs PyAV >= 14 built with it); empty uses cv2.VideoCapture
+C.LIVE.VIDEO_HWACCEL = ""
+
 # Loop video inputs when they end (useful for demo clips)
 C.LIVE.LOOP_VIDEO = True
 
@@ -3,14 +3,21 @@
 import sys
 from pathlib import Path
 
-def export_yolo_to_onnx(model_path, output_path=None, imgsz=640, half=True):
+def export_yolo_to_onnx(model_path, output_path=None, imgsz=640, half=True, dynamic=True, batch=16,
+                        device=None):
     """Export YOLO model to ONNX format.
     
     Args:
         model_path: Path to .pt YOLO model
         output_path: Output ONNX path (auto-generated if None)
         imgsz: Input image size
-        half: Use FP16 precision
+        half: Use FP16 precision (needs a CUDA GPU for the export)
+        dynamic: Export with a dynamic batch axis, so one TensorRT engine
+            serves every batch size instead of padding to a static shape
+        batch: Batch size of the trace input; the graph's batch size when
+            dynamic is off (the dynamic axis has no maximum)
+        device: Export device; defaults to GPU 0 with half, since ultralytics
+            exports FP16 (and FP16 with a dynamic axis) only on a GPU, else CPU
     """
     try:
         from ultralytics import YOLO
@@ -32,7 +39,10 @@ def export_yolo_to_onnx(model_path, output_path=None, imgsz=640, half=True):
         imgsz=imgsz,
         half=half,
         simplify=True,
-        opset=14
+        opset=17,
+        dynamic=dynamic,
+        batch=batch,
+        device=device if device is not None else (0 if half else 'cpu'),
     )
     
     print(f"✓ Exported to {output_path}")
@@ -46,8 +56,12 @@ if __name__ == "__main__":
     parser.add_argument('--model', type=str, required=True, help='Path to .pt model')
     parser.add_argument('--output', type=str, default=None, help='Output ONNX path')
     parser.add_argument('--imgsz', type=int, default=640, help='Input image size')
-    parser.add_argument('--fp16', action='store_true', help='Use FP16 precision')
+    parser.add_argument('--fp16', action='store_true', help='Use FP16 precision (needs a CUDA GPU)')
+    parser.add_argument('--static', action='store_true', help='Export a static-batch graph')
+    parser.add_argument('--batch', type=int, default=16, help='Batch size of the trace input (of the graph with --static)')
+    parser.add_argument('--device', type=str, default=None, help='Export device (default: 0 with --fp16, else cpu)')
     
     args = parser.parse_args()
     
-    export_yolo_to_onnx(args.model, args.output, args.imgsz, args.fp16)
+    export_yolo_to_onnx(args.model, args.output, args.imgsz, args.fp16,
+                        dynamic=not args.static, batch=args.batch, device=args.device)
@@ -1,43 +1,120 @@
 from pathlib import Path
 import torch
+import functools
 import os
+import sys
 import threading
 import warnings
 
-# Monkey-patch Ultralytics Profile class to disable CUDA synchronization in multi-threading
+# Monkey-patch Ultralytics Profile class to time CUDA blocks with CUDA events instead of
+# a device-wide torch.cuda.synchronize() around every block (breaks multi-threading).
+# Events are recorded on the profiled device's current stream; the elapsed time is
+# only resolved (waiting on the end event alone) when dt or t is actually read.
 try:
     from ultralytics.utils import ops
-    original_profile_time = ops.Profile.time
-    
-    def patched_profile_time(self):
-        """Patched time method that doesn't call torch.cuda.synchronize() in multi-threading."""
-        if self.cuda:
-            # Don't synchronize in multi-threaded environment
-            return time.time()
-        return original_profile_time(self)
-    
-    ops.Profile.time = patched_profile_time
+    original_profile_enter = ops.Profile.__enter__
+    original_profile_exit = ops.Profile.__exit__
+
+    def _resolve_profile(self):
+        if getattr(self, "_evt_pending", False):
+            self._evt_pending = False
+            self._evt_end.synchronize()
+            self._dt = self._evt_start.elapsed_time(self._evt_end) / 1e3
+            self._t = getattr(self, "_t", 0.0) + self._dt
+
+    def patched_profile_enter(self):
+        if not self.cuda:
+            return original_profile_enter(self)
+        _resolve_profile(self)
+        if not hasattr(self, "_evt_start"):
+            self._evt_start = torch.cuda.Event(enable_timing=True)
+            self._evt_end = torch.cuda.Event(enable_timing=True)
+        self._evt_start.record(torch.cuda.current_stream(self.device))
+        return self
+
+    def patched_profile_exit(self, type, value, traceback):
+        if not self.cuda:
+            return original_profile_exit(self, type, value, traceback)
+        self._evt_end.record(torch.cuda.current_stream(self.device))
+        self._evt_pending = True
+
+    def _lazy_attr(name):
+        def getter(self):
+            _resolve_profile(self)
+            return getattr(self, name, 0.0)
+
+        def setter(self, value):
+            setattr(self, name, value)
+
+        return property(getter, setter)
+
+    ops.Profile.__enter__ = patched_profile_enter
+    ops.Profile.__exit__ = patched_profile_exit
+    ops.Profile.dt = _lazy_attr("_dt")
+    ops.Profile.t = _lazy_attr("_t")
     print("✓ Ultralytics profiling patched for multi-GPU threading")
 except Exception as e:
     print(f"Warning: Could not patch Ultralytics profiling: {e}")
 
-import time
-
 # Global lock for CUDA operations to prevent multi-threading issues
 _cuda_lock = threading.Lock()
 
+# Serializes YOLOv5 hub loads, which mutate the process-global sys.path
+_hub_lock = threading.Lock()
 
-def load_yolo(which):
-    """Load a yolo network from local repository. Download the weights there if needed."""
-    
-    # Check if it's a custom .pt file path
-    if which.endswith('.pt') or os.path.exists(which) or os.path.exists(f'{which}.pt'):
+
+def load_yolo(which, device=None, keep_device=False, cache=True):
+    """Load a yolo network from local repository. Download the weights there if needed.
+
+    Loaded networks are cached per (resolved path, device), so callers loading a
+    checkpoint on a device again share one model. Pass the device here instead of
+    calling .to() on the result, which would move the shared instance.
+
+    The predictors are stateful and not locked: threads that detect concurrently
+    (e.g. live camera workers) pass cache=False to get their own instance.
+
+    With keep_device, YOLOv8 outputs stay on the model's device and callers
+    make the single host copy themselves (YOLOv5 outputs already do).
+    """
+    weights = _resolve_weights(which)
+    load = _load_yolo_cached if cache else _load_yolo_cached.__wrapped__
+    return load(which if weights is None else weights, weights is not None,
+                None if device is None else str(device), keep_device)
+
+
+def _resolve_weights(which):
+    """Return the local weights path `which` refers to, or None for a hub model name.
+
+    Paths are resolved with realpath so that different spellings of one file share
+    a cache entry. The '.pt' suffix is checked before touching the filesystem, so at
+    most two stat() calls are made and only for suffix-less names.
+    """
+    if which.endswith('.pt'):
+        return os.path.realpath(which)
+    for candidate in (which, f'{which}.pt'):
+        try:
+            os.stat(candidate)
+        except OSError:
+            continue
+        return os.path.realpath(candidate)
+    return None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yolo_cached(which, is_file, device, keep_device):
+    model = _load_yolo(which, is_file, keep_device)
+    if device is not None:
+        model = model.to(device)
+    return model
+
+
+def _load_yolo(which, is_file, keep_device=False):
+    # Custom weights file (.pt, or any format ultralytics can load)
+    if is_file:
         try:
             from ultralytics import YOLO
-            # Use the path as-is if it ends with .pt, otherwise add .pt
-            model_path = which if which.endswith('.pt') else f'{which}.pt'
-            model = YOLO(model_path)
-            return YOLOv8Wrapper(model)
+            model = YOLO(which)
+            return YOLOv8Wrapper(model, keep_device)
         except ImportError:
             raise ImportError("ultralytics package not installed. Run: pip install ultralytics")
     
@@ -47,35 +124,45 @@ def load_yolo(which):
             from ultralytics import YOLO
             model = YOLO(f'{which}.pt')
             # Wrap in a class to make it compatible with YOLOv5 interface
-            return YOLOv8Wrapper(model)
+            return YOLOv8Wrapper(model, keep_device)
         except ImportError:
             raise ImportError("ultralytics package not installed. Run: pip install ultralytics")
     
     # YOLOv5 loading
-    cwd = Path.cwd()
+    # Load through the 'custom' hub entry with an absolute weights path instead of
+    # os.chdir()-ing into the repo: chdir is process-global and breaks relative
+    # path I/O of other threads. Weights still live in (and download to) yolo_dir.
     yolo_dir = str(Path(__file__).parent.joinpath("yolov5"))
-    os.chdir(yolo_dir)
-    model = torch.hub.load(yolo_dir, which, source="local")
-    os.chdir(str(cwd))
+    weights = os.path.join(yolo_dir, f"{which}.pt")
+    with _hub_lock:
+        sys.path.insert(0, yolo_dir)
+        try:
+            model = torch.hub.load(yolo_dir, "custom", path=weights, source="local")
+        finally:
+            sys.path.remove(yolo_dir)
     return model
 
 
 class YOLOv8Wrapper:
     """Wrapper to make YOLOv8 compatible with YOLOv5 interface."""
     
-    def __init__(self, model):
+    def __init__(self, model, keep_device=False):
         self.model = model
         self.device_type = 'cpu'
+        self.keep_device = keep_device
     
     def to(self, device):
-        self.device_type = str(device)
-        # Set the device for this model
-        torch.cuda.set_device(device)
+        new_dev = str(device)
+        # Skip no-op moves: model.to() walks every parameter even if already placed
+        if new_dev == self.device_type:
+            return self
+        # No torch.cuda.set_device() here: it is per-thread global state and the
+        # device is passed explicitly to model.predict() in __call__
         self.model.to(device)
+        self.device_type = new_dev
         return self
     
     def __call__(self, img):
-        # Each thread has its own GPU - no lock needed
         # The key is to disable model warmup and CUDA graphs which cause threading issues
         results = self.model.predict(
             img, 
@@ -85,14 +172,15 @@ class YOLOv8Wrapper:
             # Disable CUDA graphs to prevent threading issues
             half=False,  # Disable FP16 which can trigger CUDA graphs
         )
-        return YOLOv8Results(results[0])
+        return YOLOv8Results(results[0], keep_device=self.keep_device and self.device_type != 'cpu')
 
 
 class YOLOv8Results:
     """Wrapper to make YOLOv8 results compatible with YOLOv5 results."""
     
-    def __init__(self, results):
+    def __init__(self, results, keep_device=False):
         self.results = results
+        self.keep_device = keep_device
         self.xywh = [self._get_xywh()]
     
     def _get_xywh(self):
@@ -111,4 +199,5 @@ class YOLOv8Results:
         
         # Combine with confidence and class
         result = torch.cat([xywh, boxes.conf.unsqueeze(1), boxes.cls.unsqueeze(1)], dim=1)
-        return result.cpu()
+        # Leave the device->host copy to callers that want device-side results
+        return result if self.keep_device else result.cpu()
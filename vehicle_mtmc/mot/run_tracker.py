@@ -175,8 +175,8 @@ def run_mot(cfg: CfgNode):
         raise ValueError("Tracker not implemented.")
 
     # load detector
-    detector = load_yolo(cfg.MOT.DETECTOR)
-    detector.to(device)
+    detector = load_yolo(cfg.MOT.DETECTOR, device=device,
+                         keep_device=cfg.MOT.DETECTOR_KEEP_DEVICE)
 
     # load attribute extractors
     if len(cfg.MOT.STATIC_ATTRIBUTES) > 0:
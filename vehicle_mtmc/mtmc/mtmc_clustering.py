@@ -2,10 +2,9 @@ from typing import List, Union
 import time
 import heapq
 import numpy as np
-import torch
 from scipy.cluster import hierarchy
 
-from tools.metrics import cosine_sim
+from tools.metrics import cosine_sim, cosine_sim_matrix
 from tools.data_structures import DSU
 from tools import log
 from mot.tracklet import Tracklet
@@ -124,10 +123,8 @@ def mtmc_clustering(tracks: List[List[Tracklet]],
         return False
 
     # precompute similarities between tracks
-    f = torch.Tensor(np.stack([tr.mean_feature for tr in all_tracks]))
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    f.to(device)
-    sim = torch.matmul(f, f.T).cpu().numpy()
+    f = np.stack([tr.mean_feature for tr in all_tracks])
+    sim = cosine_sim_matrix(f, f, already_normed=True)
     # log.info(f"Precomputation finished, took {time.time() - log_start_time:.3f} s.") ### DEBUG
 
     # initialize multicam tracklets
@@ -1,7 +1,10 @@
 import os
+import queue
+import socket
 import sys
 import time
 import threading
+from concurrent.futures import Future
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Dict, Optional, Tuple
 import numpy as np
@@ -15,9 +18,10 @@ os.environ['TORCH_USE_CUDA_DSA'] = '1'
 import cv2
 from config.defaults import get_cfg_defaults
 from config.config_tools import expand_relative_paths
-from tools.util import parse_args
+from tools.util import parse_args, put_latest
 from tools import log
 from mot.tracker import ByteTrackerIOU
+from mot.byte_track.matching import ious
 from mot.tracklet import Tracklet
 from detection.detection import Detection
 from detection.load_detector import load_yolo
@@ -50,18 +54,117 @@ def build_extractor(cfg: CfgNode, device: torch.device):
                              model=reid_model)
 
 
-def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
-    if a is None or b is None:
-        return -1.0
-    denom = (np.linalg.norm(a) * np.linalg.norm(b)) + 1e-12
-    return float(np.dot(a, b) / denom)
+def make_jpeg_encoder(device: torch.device, quality: int = 75):
+    """Return a function encoding a BGR frame to JPEG bytes.
+
+    On CUDA devices this uses torchvision's nvJPEG-backed GPU encoder if the
+    installed torchvision supports it, otherwise (or on CPU) cv2.imencode.
+    """
+    cv_params = [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+    def encode_cpu(frame: np.ndarray) -> Optional[bytes]:
+        ok, buf = cv2.imencode('.jpg', frame, cv_params)
+        return buf.tobytes() if ok else None
+
+    if device.type != "cuda":
+        return encode_cpu
+
+    try:
+        from torchvision.io import encode_jpeg
+
+        def encode_gpu(frame: np.ndarray) -> Optional[bytes]:
+            t = torch.from_numpy(np.ascontiguousarray(frame)).to(device)
+            t = t.permute(2, 0, 1).flip(0).contiguous()  # HWC BGR -> CHW RGB
+            return encode_jpeg(t, quality=quality).cpu().numpy().tobytes()
+
+        encode_gpu(np.zeros((8, 8, 3), dtype=np.uint8))  # probe GPU encoding support
+        return encode_gpu
+    except Exception as e:
+        log.info(f"GPU JPEG encoding unavailable ({e}), using cv2.imencode")
+        return encode_cpu
+
+
+class HWVideoReader:
+    """Subset of the cv2.VideoCapture interface used by the live workers, decoding
+    with PyAV through a hardware decoder (e.g. NVDEC with hwaccel="cuda").
+
+    Frames are returned as BGR ndarrays like cv2 does; grab() skips only the color
+    conversion (PyAV copies decoded frames back to system memory either way). Decode
+    errors end the stream with a False return, as cv2 does, instead of raising.
+    """
+
+    def __init__(self, path: str, hwaccel: str):
+        import av
+        from av.codec.hwaccel import HWAccel
+        self._decode_error = av.error.FFmpegError
+        self.path = path
+        self.container = av.open(path, hwaccel=HWAccel(device_type=hwaccel, allow_software_fallback=True))
+        self.stream = self.container.streams.video[0]
+        self._frames = self.container.decode(self.stream)
+
+    def isOpened(self) -> bool:
+        return True
+
+    def _next_frame(self):
+        try:
+            return next(self._frames, None)
+        except self._decode_error as e:
+            log.warning(f"Decoding {self.path} failed: {e}")
+            return None
+
+    def grab(self) -> bool:
+        return self._next_frame() is not None
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        return True, frame.to_ndarray(format="bgr24")
+
+    def set(self, prop: int, value) -> bool:
+        # Only rewinding (CAP_PROP_POS_FRAMES = 0, for LOOP_VIDEO) is supported
+        if prop != cv2.CAP_PROP_POS_FRAMES or value != 0:
+            return False
+        self.container.seek(0)
+        self._frames = self.container.decode(self.stream)
+        return True
+
+    def release(self):
+        self.container.close()
+
+
+def open_video(path: str, hwaccel: str = ""):
+    """Open a video file with hardware decoding if requested and available, else cv2."""
+    if hwaccel:
+        try:
+            return HWVideoReader(path, hwaccel)
+        except Exception as e:
+            log.info(f"Hardware video decoding ({hwaccel}) unavailable for {path} ({e}), using cv2")
+    return cv2.VideoCapture(path)
+
+
+def _build_gid_palette() -> list:
+    """Deterministic pseudo-random BGR color per gid. The channels are affine in gid
+    modulo 256, so 256 entries indexed by gid & 0xFF cover every gid (including -1)."""
+    gid = np.arange(256, dtype=np.int64)
+    palette = np.stack([(97 * gid + 53) & 255,
+                        (17 * gid + 101) & 255,
+                        (37 * gid + 17) & 255], axis=1)
+    return [tuple(c) for c in palette.tolist()]
+
+
+_GID_PALETTE = _build_gid_palette()
 
 
 class VirtualClock:
     def __init__(self, interval: float, max_skew: int, stall_seconds: float, worker_names):
         self.interval = interval
         self.max_skew = max_skew
-        self._cv = threading.Condition()
+        # One condition per worker over a shared lock, so a tick or a mark only wakes
+        # the workers that can actually progress instead of every camera thread
+        self._lock = threading.Lock()
+        self._worker_cv = {name: threading.Condition(self._lock) for name in worker_names}
+        self._waiting: Dict[str, int] = {}
         self._tick = 0
         self._running = False
         self._thread: Optional[threading.Thread] = None
@@ -83,52 +186,142 @@ class VirtualClock:
             now = time.time()
             sleep_for = max(0.0, next_time - now)
             time.sleep(sleep_for)
-            with self._cv:
+            with self._lock:
                 self._tick += 1
-                self._cv.notify_all()
+                self._notify_ready()
             next_time += self.interval
 
+    @property
+    def tick(self) -> int:
+        """Current tick of the clock."""
+        return self._tick
+
+    def _next_tick(self) -> int:
+        target_tick = self._tick
+        min_seen = min(self._seen.values()) if self._seen else target_tick
+        allowed_tick = min_seen + self.max_skew
+        return min(target_tick, allowed_tick)
+
+    def _notify_ready(self):
+        """Wake the waiting workers that can progress now. Caller holds the lock."""
+        next_tick = self._next_tick()
+        for worker, last_seen in self._waiting.items():
+            if next_tick > last_seen:
+                self._worker_cv[worker].notify()
+
     def wait_for_tick(self, worker: str, last_seen: int) -> Optional[int]:
-        with self._cv:
+        with self._lock:
+            cv = self._worker_cv.setdefault(worker, threading.Condition(self._lock))
             while self._running:
                 now = time.time()
                 stale = [w for w, ts in self._last_ts.items() if now - ts > self.stall_seconds]
                 for w in stale:
                     self._seen.pop(w, None)
                     self._last_ts.pop(w, None)
+                if stale:
+                    self._notify_ready()
 
-                target_tick = self._tick
-                min_seen = min(self._seen.values()) if self._seen else target_tick
-                allowed_tick = min_seen + self.max_skew
-                next_tick = min(target_tick, allowed_tick)
-
+                next_tick = self._next_tick()
                 if next_tick > last_seen:
                     return next_tick
 
-                self._cv.wait(timeout=0.5)
+                self._waiting[worker] = last_seen
+                try:
+                    cv.wait(timeout=0.5)
+                finally:
+                    self._waiting.pop(worker, None)
             return None
 
     def mark(self, worker: str, tick: int):
-        with self._cv:
+        with self._lock:
             if worker in self._seen:
                 self._seen[worker] = tick
                 self._last_ts[worker] = time.time()
-            self._cv.notify_all()
+            self._notify_ready()
 
     def retire(self, worker: str):
-        with self._cv:
+        with self._lock:
             self._seen.pop(worker, None)
             self._last_ts.pop(worker, None)
-            self._cv.notify_all()
+            self._notify_ready()
 
     def stop(self):
         self._running = False
-        with self._cv:
-            self._cv.notify_all()
+        with self._lock:
+            for cv in self._worker_cv.values():
+                cv.notify_all()
         if self._thread:
             self._thread.join(timeout=2)
 
 
+class ReIDService(threading.Thread):
+    """ReID extractor shared by the camera workers on one device.
+
+    Requests submitted within `window` seconds of the first pending one (up to
+    `max_batch` crops) run as one inference when the extractor supports
+    extract_batch (ONNX); otherwise they run one after another on the shared model.
+    """
+
+    def __init__(self, extractor, window: float = 0.005, max_batch: Optional[int] = None):
+        super().__init__(daemon=True, name="reid_service")
+        self.extractor = extractor
+        self.window = window
+        buckets = getattr(extractor, "batch_buckets", ())
+        self.max_batch = max_batch or (max(buckets) if buckets else 32)
+        self._batched = hasattr(extractor, "extract_batch")
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._stopped = False
+
+    def submit(self, frame: np.ndarray, boxes, bgr: bool = False) -> Future:
+        fut = Future()
+        if self._stopped:
+            fut.set_exception(RuntimeError("ReID service stopped"))
+        else:
+            self._queue.put((frame, boxes, bgr, fut))
+        return fut
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            pending = [item]
+            n_boxes = len(item[1])
+            deadline = time.monotonic() + self.window
+            while n_boxes < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                pending.append(item)
+                n_boxes += len(item[1])
+            self._extract(pending)
+
+    def _extract(self, pending):
+        try:
+            if self._batched:
+                results = self.extractor.extract_batch([(frame, boxes, bgr) for frame, boxes, bgr, _ in pending])
+            else:
+                results = [self.extractor(frame, boxes) for frame, boxes, _, _ in pending]
+        except Exception as e:
+            for *_, fut in pending:
+                fut.set_exception(e)
+            return
+        for (*_, fut), res in zip(pending, results):
+            fut.set_result(res)
+
+
 class LiveMTMCAggregator:
     def __init__(self, cams: Optional[CameraLayout], min_sim: float, linkage: str,
                  min_track_frames: int, cluster_interval: float):
@@ -141,6 +334,11 @@ class LiveMTMCAggregator:
         self._tracks_by_cam: Dict[int, list] = {}
         self._gid_map: Dict[int, Dict[int, int]] = {}
         self._last_cluster_ts = 0.0
+        # Per-camera signatures of the clustering input: the tracks long enough to be
+        # clustered with their feature_version (bumped by the worker when a fresh ReID
+        # feature is added). A camera is dirty when this changed since the last clustering
+        self._signatures: Dict[int, tuple] = {}
+        self._dirty_cams = set()
 
     def update(self, cam_idx: int, tracks: list) -> Dict[int, int]:
         """Update tracks for a camera and recompute global IDs.
@@ -149,6 +347,11 @@ class LiveMTMCAggregator:
         """
         with self._lock:
             self._tracks_by_cam[cam_idx] = list(tracks)
+            sig = frozenset((t.track_id, getattr(t, "feature_version", 0)) for t in tracks
+                            if len(t.frames) >= self.min_track_frames)
+            if self._signatures.get(cam_idx) != sig:
+                self._signatures[cam_idx] = sig
+                self._dirty_cams.add(cam_idx)
             self._recompute()
             return dict(self._gid_map.get(cam_idx, {}))
 
@@ -163,10 +366,14 @@ class LiveMTMCAggregator:
         if total_tracks == 0:
             # No active tracks anywhere; keep gid map empty
             self._gid_map = {i: {} for i in range(n_cams)}
+            self._dirty_cams.clear()
             return
 
         if now - self._last_cluster_ts < self.cluster_interval:
             return
+        # Nothing changed since the last clustering, its gid map still holds
+        if not self._dirty_cams:
+            return
 
         # preserve original ids
         for ci, tlist in enumerate(tracks_list):
@@ -187,6 +394,7 @@ class LiveMTMCAggregator:
         total_filtered = sum(len(t) for t in filtered_tracks)
         if total_filtered == 0:
             self._gid_map = {i: {} for i in range(n_cams)}
+            self._dirty_cams.clear()
             return
 
         mtracks = mtmc_clustering(filtered_tracks, self.cams, min_sim=self.min_sim, linkage=self.linkage)
@@ -206,25 +414,36 @@ class LiveMTMCAggregator:
 
         self._gid_map = gid_map
         self._last_cluster_ts = now
+        self._dirty_cams.clear()
 
 
 class MJPEGBroadcaster:
     def __init__(self, port: int):
         self.port = port
         self.frames: Dict[str, Optional[bytes]] = {}
+        # Bumped on every update so streaming handlers send each frame exactly once
+        self._versions: Dict[str, int] = {}
         self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)
         self._server: Optional[ThreadingHTTPServer] = None
         self._thread: Optional[threading.Thread] = None
         self._running = threading.Event()
 
     def update_frame(self, name: str, frame_bytes: bytes):
-        with self._lock:
+        with self._cv:
             self.frames[name] = frame_bytes
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self._cv.notify_all()
 
     def _handler_factory(self):
         outer = self
 
         class Handler(BaseHTTPRequestHandler):
+            def setup(self):
+                super().setup()
+                # Each frame goes out as one write; don't hold it back for Nagle
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
             def do_GET(self):
                 path = self.path.lstrip("/") or "index"
                 cam_name = path.split(".")[0]
@@ -247,19 +466,25 @@ class MJPEGBroadcaster:
                 self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={boundary}")
                 self.end_headers()
 
+                boundary_bytes = boundary.encode()
+                last_seen = 0
                 try:
                     while outer._running.is_set():
-                        with outer._lock:
+                        # Sleep until the camera publishes a new frame (the timeout
+                        # only bounds how long a stop() can go unnoticed)
+                        with outer._cv:
+                            outer._cv.wait_for(lambda: outer._versions.get(cam_name, 0) != last_seen
+                                               or not outer._running.is_set(), timeout=1.0)
                             buf = outer.frames.get(cam_name)
+                            version = outer._versions.get(cam_name, 0)
+                        if version == last_seen:
+                            continue
+                        last_seen = version
                         if buf is None:
-                            time.sleep(0.05)
                             continue
-                        self.wfile.write(boundary.encode() + b"\r\n")
-                        self.wfile.write(b"Content-Type: image/jpeg\r\n")
-                        self.wfile.write(f"Content-Length: {len(buf)}\r\n\r\n".encode())
-                        self.wfile.write(buf)
-                        self.wfile.write(b"\r\n")
-                        time.sleep(0.001)
+                        # Boundary, part headers and payload in a single send
+                        self.wfile.write(b"%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%s\r\n"
+                                         % (boundary_bytes, len(buf), buf))
                 except (BrokenPipeError, ConnectionResetError):
                     pass
 
@@ -276,6 +501,8 @@ class MJPEGBroadcaster:
 
     def stop(self):
         self._running.clear()
+        with self._cv:
+            self._cv.notify_all()
         if self._server:
             self._server.shutdown()
         if self._thread:
@@ -284,7 +511,8 @@ class MJPEGBroadcaster:
 
 class LiveMOTWorker(threading.Thread):
     def __init__(self, cam_idx: int, cam_cfg: CfgNode, base_cfg: CfgNode,
-                 aggregator, broadcaster: MJPEGBroadcaster):
+                 aggregator, broadcaster: MJPEGBroadcaster,
+                 reid_services: Optional[Dict[str, "ReIDService"]] = None):
         super().__init__(daemon=True)
         self.cam_idx = cam_idx
         self.cam_cfg = cam_cfg
@@ -293,8 +521,12 @@ class LiveMOTWorker(threading.Thread):
         self.broadcaster = broadcaster
         self.name = cam_cfg.get("name", f"cam_{cam_idx}")
         self.device = self._select_device(base_cfg)
-        self.detector = load_yolo(cam_cfg.get("detector", base_cfg.MOT.DETECTOR)).to(self.device)
+        # One detector per camera thread, so cameras on one GPU detect in parallel
+        self.detector = load_yolo(cam_cfg.get("detector", base_cfg.MOT.DETECTOR), device=self.device,
+                                  keep_device=base_cfg.MOT.DETECTOR_KEEP_DEVICE, cache=False)
         self.tracked_classes = cam_cfg.get("tracked_classes", base_cfg.MOT.TRACKED_CLASSES)
+        self._tracked_classes = np.asarray(self.tracked_classes, dtype=np.int32)
+        self._tracked_classes_t = None  # on the detector output's device, set on first frame
         
         # Improved tracking parameters for parking lot scenarios
         # Lower thresholds help maintain track continuity with stationary vehicles
@@ -306,7 +538,23 @@ class LiveMOTWorker(threading.Thread):
             lost_track_keep_seconds=10.0  # Keep tracks longer (vehicles may be temporarily occluded)
         )
         
-        self.extractor = build_extractor(base_cfg, self.device)
+        if reid_services is not None:
+            # One shared extractor (and batching thread) per device
+            key = str(self.device)
+            if key not in reid_services:
+                reid_services[key] = ReIDService(build_extractor(base_cfg, self.device),
+                                                 window=base_cfg.LIVE.REID_BATCH_WINDOW_MS / 1000.0)
+            self.reid_service = reid_services[key]
+            self.extractor = self.reid_service.extractor
+        else:
+            self.reid_service = None
+            self.extractor = build_extractor(base_cfg, self.device)
+        # The ONNX extractor can take BGR frames and crop them on the GPU directly
+        self._reid_takes_bgr = getattr(self.extractor, "gpu_preprocess", False)
+        # ReID feature reuse: track_id -> (frame_id, tlwh, feature) of the last extraction
+        self._feat_cache: Dict[int, Tuple[int, np.ndarray, np.ndarray]] = {}
+        self.reid_max_age = base_cfg.LIVE.REID_MAX_AGE
+        self.reid_min_iou = 1.0 - base_cfg.LIVE.REID_MAX_BOX_CHANGE
         self.video_path = cam_cfg.get("video")
         
         # Support both HTTP streams and video files
@@ -328,7 +576,7 @@ class LiveMOTWorker(threading.Thread):
                 log.error(f"Camera {self.name}: video source missing at {self.video_path}")
                 self.bad_source = True
             else:
-                self.cap = cv2.VideoCapture(self.video_path)
+                self.cap = open_video(self.video_path, base_cfg.LIVE.VIDEO_HWACCEL)
                 if not self.cap.isOpened():
                     log.error(f"Camera {self.name}: cannot open video {self.video_path}")
                     self.bad_source = True
@@ -336,11 +584,16 @@ class LiveMOTWorker(threading.Thread):
         self.target_interval = 1.0 / float(base_cfg.LIVE.TARGET_FPS)
         self.min_confid = 0.25  # Increased from 0.05 to reduce false positives
         self.local_to_global: Dict[int, int] = {}
-        self.gid_colors: Dict[int, Tuple[int, int, int]] = {}
         self.stop_event = threading.Event()
         self.frame_id = 0
         self.vclock = None
 
+        # JPEG encoding runs on a separate thread so detection/ReID of the next frame
+        # overlaps with compressing the previous one; only the newest frames are kept
+        self._enc_q: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=2)
+        self._encode_jpeg = make_jpeg_encoder(self.device, quality=75)
+        self._encoder = threading.Thread(target=self._encode_loop, daemon=True)
+
     def _select_device(self, cfg: CfgNode) -> torch.device:
         if len(cfg.SYSTEM.GPU_IDS) == 0:
             return torch.device("cpu")
@@ -356,8 +609,8 @@ class LiveMOTWorker(threading.Thread):
         log.info(f"Camera {self.cam_idx} assigned to GPU {gpu_id}")
         return torch.device(f"cuda:{gpu_id}")
     
-    def _read_http_frame(self):
-        """Read a single frame from HTTP MJPEG stream."""
+    def _read_http_frame(self, decode: bool = True):
+        """Read a single frame from HTTP MJPEG stream (without decoding it if not decode)."""
         try:
             # Read until we find JPEG start marker
             while True:
@@ -367,12 +620,23 @@ class LiveMOTWorker(threading.Thread):
                 if a != -1 and b != -1:
                     jpg = self.stream_bytes[a:b+2]
                     self.stream_bytes = self.stream_bytes[b+2:]
+                    if not decode:
+                        return True, None
                     frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
                     return True, frame
         except Exception as e:
             log.error(f"Camera {self.name}: Error reading HTTP stream: {e}")
             return False, None
 
+    def _encode_loop(self):
+        while True:
+            frame = self._enc_q.get()
+            if frame is None:
+                break
+            buf = self._encode_jpeg(frame)
+            if buf is not None:
+                self.broadcaster.update_frame(self.name, buf)
+
     def run(self):
         log.info("Starting camera %s", self.name)
         last_ts = time.time()
@@ -380,14 +644,22 @@ class LiveMOTWorker(threading.Thread):
             if self.bad_source:
                 log.error("Camera %s exiting due to bad source", self.name)
                 return
+            self._encoder.start()
             while not self.stop_event.is_set():
                 tick = self.vclock.wait_for_tick(self.name, self.frame_id)
                 if tick is None:
                     break
                 
+                # Drop the frame without decoding it if the encoder is backed up or this
+                # camera fell more than max_skew ticks behind the clock: processing it
+                # would only add latency to a stream that shows the newest frame anyway
+                skip = self._enc_q.full() or self.vclock.tick - tick > self.vclock.max_skew
+                
                 # Read frame from HTTP stream or video file
                 if self.is_http_stream:
-                    ret, frame = self._read_http_frame()
+                    ret, frame = self._read_http_frame(decode=not skip)
+                elif skip:
+                    ret, frame = self.cap.grab(), None
                 else:
                     ret, frame = self.cap.read()
                 
@@ -398,13 +670,15 @@ class LiveMOTWorker(threading.Thread):
                     log.info("Camera %s ended", self.name)
                     break
 
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                if skip:
+                    self.frame_id = tick
+                    self.vclock.mark(self.name, tick)
+                    continue
+
+                frame_rgb = None if self._reid_takes_bgr else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 detections, tracks = self._process_frame(frame, frame_rgb)
                 annotated = self._annotate(frame, tracks)
-
-                ok, buf = cv2.imencode('.jpg', annotated)
-                if ok:
-                    self.broadcaster.update_frame(self.name, buf.tobytes())
+                put_latest(self._enc_q, annotated)
 
                 # pace output
                 elapsed = time.time() - last_ts
@@ -414,37 +688,38 @@ class LiveMOTWorker(threading.Thread):
                 self.frame_id = tick
                 self.vclock.mark(self.name, tick)
         finally:
+            if self._encoder.is_alive():
+                put_latest(self._enc_q, None)
             if self.vclock:
                 self.vclock.retire(self.name)
 
     def _process_frame(self, frame_bgr, frame_rgb):
-        res = self.detector(frame_bgr).xywh[0].cpu().numpy()
-        boxes_raw = [t[:4] for t in res]
-        scores_raw = [t[4] for t in res]
-        classes_raw = [t[5] for t in res]
-
-        filtered = []
-        for bbox, score, cl in zip(boxes_raw, scores_raw, classes_raw):
-            if score < self.min_confid:
-                continue
-            if cl not in self.tracked_classes:
-                continue
-            filtered.append((bbox, score, cl))
+        res = self.detector(frame_bgr).xywh[0]
+        # Filter by confidence and class and convert to tlwh where the detector left
+        # its output (the GPU with MOT.DETECTOR_KEEP_DEVICE), so only the surviving
+        # rows are copied to the host
+        if self._tracked_classes_t is None:
+            self._tracked_classes_t = torch.as_tensor(self._tracked_classes, device=res.device)
+        mask = (res[:, 4] >= self.min_confid) & torch.isin(res[:, 5].int(), self._tracked_classes_t)
+        dets = res[mask]
+        # center xywh -> tlwh; the top-left corner is truncated to whole pixels
+        dets[:, :2] = (dets[:, :2] - dets[:, 2:4] / 2).trunc()
+        dets = dets.cpu().numpy()
+        boxes_tlwh = dets[:, :4]
+        scores = dets[:, 4]
+        classes = dets[:, 5].astype(np.int32)
         
         # Log tracking status every 30 frames
         if self.frame_id % 30 == 0:
-            log.info(f"{self.name}: Frame {self.frame_id} - Detections: {len(filtered)}/{len(boxes_raw)}, Active tracks: {len(self.tracker.active_tracks)}")
+            log.info(f"{self.name}: Frame {self.frame_id} - Detections: {len(dets)}/{len(res)}, Active tracks: {len(self.tracker.active_tracks)}")
 
-        boxes_tlwh = [[int(x - w / 2), int(y - h / 2), w, h] for (x, y, w, h), _, _ in filtered]
-        scores = [s for _, s, _ in filtered]
-        classes = [c for _, _, c in filtered]
-
-        features = self.extractor(frame_rgb, boxes_tlwh) if len(boxes_tlwh) > 0 else []
+        features, extracted = self._extract_features(frame_bgr, frame_rgb, boxes_tlwh)
         detections = [Detection(bbox, score, clname, feature)
                       for bbox, score, clname, feature in zip(boxes_tlwh, scores, classes, features)]
 
         self.tracker.update(self.frame_id, detections, None, None)
         tracks = self.tracker.active_tracks
+        self._update_feat_cache(detections, extracted, tracks)
         
         for trk in tracks:
             trk.compute_mean_feature()
@@ -454,6 +729,68 @@ class LiveMOTWorker(threading.Thread):
             self.local_to_global[lid] = gid
         return detections, tracks
 
+    def _extract_features(self, frame_bgr, frame_rgb, boxes_tlwh):
+        """Run ReID only on detections whose appearance may have changed.
+
+        A detection reuses the cached feature of a track if its box overlaps the box of
+        that track's last extraction with IoU >= reid_min_iou and the extraction is less
+        than reid_max_age frames old. Returns the features and the indices of the
+        detections that were actually extracted.
+        """
+        n = len(boxes_tlwh)
+        if n == 0:
+            return [], []
+        features = [None] * n
+        to_extract = list(range(n))
+        if self._feat_cache:
+            cached = [(fid, tlwh, feat) for fid, tlwh, feat in self._feat_cache.values()
+                      if self.frame_id - fid < self.reid_max_age]
+            if cached:
+                det_tlbr = np.asarray(boxes_tlwh, dtype=np.float64)
+                det_tlbr[:, 2:] += det_tlbr[:, :2]
+                cache_tlbr = np.array([tlwh for _, tlwh, _ in cached], dtype=np.float64)
+                cache_tlbr[:, 2:] += cache_tlbr[:, :2]
+                overlap = ious(det_tlbr, cache_tlbr)
+                best = overlap.argmax(axis=1)
+                to_extract = []
+                for i in range(n):
+                    if overlap[i, best[i]] >= self.reid_min_iou:
+                        features[i] = cached[best[i]][2]
+                    else:
+                        to_extract.append(i)
+        if to_extract:
+            boxes = [boxes_tlwh[i] for i in to_extract]
+            frame = frame_bgr if self._reid_takes_bgr else frame_rgb
+            if self.reid_service is not None:
+                new_features = self.reid_service.submit(frame, boxes, bgr=self._reid_takes_bgr).result()
+            elif self._reid_takes_bgr:
+                new_features = self.extractor(frame, boxes, bgr=True)
+            else:
+                new_features = self.extractor(frame, boxes)
+            for i, feat in zip(to_extract, new_features):
+                features[i] = feat
+        return features, to_extract
+
+    def _update_feat_cache(self, detections, extracted, tracks):
+        """Remember freshly extracted features for the tracks they were assigned to."""
+        # Tracklet.update stores the Detection's own tlwh array, so identity links a
+        # track's latest box back to its detection
+        fresh = {id(detections[i].tlwh): i for i in extracted}
+        cache = {}
+        for trk in tracks:
+            if trk.frames and trk.frames[-1] == self.frame_id:
+                i = fresh.get(id(trk.bboxes[-1]))
+                if i is not None:
+                    det = detections[i]
+                    cache[trk.track_id] = (self.frame_id, det.tlwh, det.feature)
+                    # Reused features barely move the mean; fresh ones mark it changed
+                    # for the aggregator
+                    trk.feature_version = getattr(trk, "feature_version", 0) + 1
+                    continue
+            if trk.track_id in self._feat_cache:
+                cache[trk.track_id] = self._feat_cache[trk.track_id]
+        self._feat_cache = cache
+
     def _annotate(self, frame_bgr, tracks):
         vis = frame_bgr.copy()
         for trk in tracks:
@@ -470,13 +807,7 @@ class LiveMOTWorker(threading.Thread):
         return vis
 
     def _color_for_gid(self, gid: int) -> Tuple[int, int, int]:
-        if gid not in self.gid_colors:
-            # deterministic pseudo-random color per gid
-            r = (37 * gid + 17) % 256
-            g = (17 * gid + 101) % 256
-            b = (97 * gid + 53) % 256
-            self.gid_colors[gid] = (int(b), int(g), int(r))
-        return self.gid_colors[gid]
+        return _GID_PALETTE[gid & 0xFF]
 
     def stop(self):
         self.stop_event.set()
@@ -508,14 +839,17 @@ def run_live(cfg: CfgNode):
 
     vclock.start()
 
+    reid_services: Optional[Dict[str, ReIDService]] = {} if cfg.LIVE.SHARED_REID else None
     workers = []
     for idx, cam_info in enumerate(cfg.EXPRESS.CAMERAS):
         cam_cfg = dict(cam_info)
-        worker = LiveMOTWorker(idx, cam_cfg, cfg, aggregator, broadcaster)
+        worker = LiveMOTWorker(idx, cam_cfg, cfg, aggregator, broadcaster, reid_services)
         worker.vclock = vclock
         workers.append(worker)
         broadcaster.update_frame(cam_cfg.get("name", f"cam_{idx}"), None)
 
+    for svc in (reid_services or {}).values():
+        svc.start()
     for w in workers:
         w.start()
 
@@ -527,6 +861,8 @@ def run_live(cfg: CfgNode):
     finally:
         for w in workers:
             w.stop()
+        for svc in (reid_services or {}).values():
+            svc.stop()
         vclock.stop()
         broadcaster.stop()
 
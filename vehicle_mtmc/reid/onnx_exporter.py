@@ -10,7 +10,7 @@ sys.path.append(os.path.join(SCRIPT_DIR, 'vehicle_reid'))
 from vehicle_reid.load_model import load_model_from_opts
 
 
-def export_reid_to_onnx(opts_yaml, checkpoint, output_path, opset_version=14):
+def export_reid_to_onnx(opts_yaml, checkpoint, output_path, opset_version=14, half=False):
     """Export ReID model to ONNX format.
     
     Args:
@@ -18,6 +18,8 @@ def export_reid_to_onnx(opts_yaml, checkpoint, output_path, opset_version=14):
         checkpoint: Path to model checkpoint (.pth), or None for raw pretrained
         output_path: Output ONNX file path
         opset_version: ONNX opset version
+        half: Export FP16 weights and a FP16 input (needs CUDA), so FP16
+            runtimes don't insert an input cast on every inference
     """
     print(f"Loading model from {opts_yaml}...")
     model = load_model_from_opts(
@@ -33,6 +35,11 @@ def export_reid_to_onnx(opts_yaml, checkpoint, output_path, opset_version=14):
     
     # Dummy input (batch_size=1, channels=3, height=256, width=128)
     dummy_input = torch.randn(1, 3, 256, 128, device=device)
+    if half:
+        if device.type != 'cuda':
+            raise RuntimeError("FP16 export requires CUDA")
+        model = model.half()
+        dummy_input = dummy_input.half()
     
     print(f"Exporting to {output_path}...")
     torch.onnx.export(
@@ -73,7 +80,8 @@ if __name__ == "__main__":
     parser.add_argument('--checkpoint', type=str, default=None, help='Path to checkpoint .pth (optional)')
     parser.add_argument('--output', type=str, required=True, help='Output ONNX path')
     parser.add_argument('--opset', type=int, default=14, help='ONNX opset version')
+    parser.add_argument('--half', action='store_true', help='Export FP16 weights and input')
     
     args = parser.parse_args()
     
-    export_reid_to_onnx(args.opts, args.checkpoint, args.output, args.opset)
+    export_reid_to_onnx(args.opts, args.checkpoint, args.output, args.opset, args.half)
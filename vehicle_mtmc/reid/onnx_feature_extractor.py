@@ -1,22 +1,36 @@
 """ONNX Runtime-based feature extractor for faster inference."""
 
+import bisect
+
 import numpy as np
 import cv2
 try:
     import onnxruntime as ort
 except ImportError:
     ort = None
+try:
+    import torch
+    from torchvision.ops import roi_align
+except ImportError:
+    torch = None
 
 
 class ONNXFeatureExtractor:
     """Fast feature extractor using ONNX Runtime."""
     
-    def __init__(self, onnx_path, use_gpu=True):
+    def __init__(self, onnx_path, use_gpu=True, gpu_preprocess=True, batch_buckets=()):
         if ort is None:
             raise ImportError("onnxruntime not installed. Install with: pip install onnxruntime-gpu")
         
         self.input_size = (128, 256)  # width, height
         
+        # ImageNet stats in 0..255 pixel units, shaped to broadcast over an
+        # (N, C, H, W) batch: (x / 255 - mean) / std == (x - 255 * mean) * inv_std
+        self._mean = (np.array([0.485, 0.456, 0.406]) * 255).astype(np.float32).reshape(1, 3, 1, 1)
+        self._inv_std = (1 / (np.array([0.229, 0.224, 0.225]) * 255)).astype(np.float32).reshape(1, 3, 1, 1)
+        # Reused HWC uint8 scratch for cv2.resize output
+        self._resize_buf = np.empty((self.input_size[1], self.input_size[0], 3), dtype=np.uint8)
+        
         # Setup ONNX Runtime session with CUDA (skip TensorRT for threading compatibility)
         providers = []
         if use_gpu:
@@ -40,69 +54,190 @@ class ONNXFeatureExtractor:
         self.input_name = self.session.get_inputs()[0].name
         self.output_name = self.session.get_outputs()[0].name
         
+        # Feed the model's own input precision so no cast runs per inference
+        # (FP16 models come from onnx_exporter.py --half)
+        self.input_dtype = np.float16 if 'float16' in self.session.get_inputs()[0].type else np.float32
+        
+        # Optionally pad GPU batches up to fixed sizes (larger batches run unpadded).
+        # Off by default: the CUDA provider runs any batch size as is, and padding
+        # only pays off for engines built with one static profile per size
+        # (tensorrt_exporter.py --static-batches)
+        on_cuda = self.session.get_providers()[0] == 'CUDAExecutionProvider'
+        self.batch_buckets = tuple(sorted(batch_buckets)) if on_cuda and batch_buckets else ()
+        
+        # Crop/resize/normalize on the GPU and hand the device buffer to ORT through
+        # IOBinding, so the float batch never crosses PCIe (CUDA provider only)
+        self.gpu_preprocess = (gpu_preprocess and torch is not None and torch.cuda.is_available()
+                               and on_cuda)
+        if self.gpu_preprocess:
+            self._device = torch.device('cuda', 0)  # ORT CUDA provider default device
+            self._mean_gpu = torch.from_numpy(self._mean).to(self._device)
+            self._inv_std_gpu = torch.from_numpy(self._inv_std).to(self._device)
+            self.io_binding = self.session.io_binding()
+        
         print(f"✓ ONNX ReID model loaded on {self.session.get_providers()[0]}")
     
-    def preprocess(self, img):
-        """Preprocess image for ReID model."""
+    @staticmethod
+    def _to_3ch(img):
         if len(img.shape) == 2:  # grayscale
             img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
         elif img.shape[2] == 4:  # RGBA
             img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
-        
-        # Resize
-        img = cv2.resize(img, self.input_size)
+        return img
+    
+    def preprocess(self, img):
+        """Preprocess image for ReID model."""
+        return self.preprocess_batch([img])[0]
+    
+    def _padded_size(self, n):
+        """Smallest batch bucket that fits n patches (n itself if none does)."""
+        i = bisect.bisect_left(self.batch_buckets, n)
+        return self.batch_buckets[i] if i < len(self.batch_buckets) else n
+    
+    def preprocess_batch(self, patches, batch_size=None):
+        """Preprocess image patches into one contiguous (N, 3, H, W) float32 batch.
+        
+        Each patch is resized into a reused scratch buffer and written straight
+        into its slot of the batch (HWC -> CHW and the uint8 -> float32 cast
+        happen in that single copy), then normalization runs once over the
+        whole batch in place. Rows past len(patches), up to batch_size, are
+        zero padding.
+        """
+        w, h = self.input_size
+        n = len(patches)
+        batch = np.empty((max(n, batch_size or 0), 3, h, w), dtype=np.float32)
+        batch[n:] = 0
+        for i, img in enumerate(patches):
+            img = cv2.resize(self._to_3ch(img), self.input_size, dst=self._resize_buf)
+            batch[i] = img.transpose(2, 0, 1)
         
         # Normalize (ImageNet stats)
-        img = img.astype(np.float32) / 255.0
-        mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-        std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-        img = (img - mean) / std
-        
-        # HWC -> CHW
-        img = np.transpose(img, (2, 0, 1))
+        batch -= self._mean
+        batch *= self._inv_std
+        return batch
+    
+    @staticmethod
+    def _clip_boxes(frame, bboxes):
+        """Clip tlwh boxes to the frame; invalid boxes become None."""
+        h_frame, w_frame = frame.shape[:2]
+        boxes = []
+        for bbox in bboxes:
+            x, y, w, h = bbox
+            x, y, w, h = int(x), int(y), int(w), int(h)
+            
+            # Ensure bbox is within frame bounds
+            x = max(0, x)
+            y = max(0, y)
+            w = min(w, w_frame - x)
+            h = min(h, h_frame - y)
+            boxes.append((x, y, w, h) if w > 0 and h > 0 else None)
+        return boxes
+    
+    def preprocess_gpu(self, frame, boxes, batch_size=None, bgr=False):
+        """Crop, resize and normalize clipped boxes on the GPU into an (N, 3, H, W) tensor.
         
-        return img
+        The frame is uploaded once; BGR -> RGB is a channel flip on the device, and
+        all crops are resized in a single roi_align call (one bilinear sample per
+        output pixel, i.e. the same sampling as a bilinear resize of each crop).
+        """
+        w, h = self.input_size
+        t = torch.from_numpy(np.ascontiguousarray(frame)).to(self._device, non_blocking=True)
+        if bgr:
+            t = t.flip(2)
+        img = t.permute(2, 0, 1).unsqueeze(0).float()  # 1, C, H, W
+        n = max(len(boxes), batch_size or 0)
+        batch = torch.zeros((n, 3, h, w), dtype=torch.float32, device=self._device)
+        valid = [i for i, box in enumerate(boxes) if box is not None]  # invalid bbox, empty patch
+        if valid:
+            rois = torch.tensor([[0, x, y, x + bw, y + bh] for x, y, bw, bh in (boxes[i] for i in valid)],
+                                dtype=torch.float32, device=self._device)
+            batch[valid] = roi_align(img, rois, output_size=(h, w), spatial_scale=1.0,
+                                     sampling_ratio=1, aligned=True)
+        batch -= self._mean_gpu
+        batch *= self._inv_std_gpu
+        if self.input_dtype == np.float16:
+            batch = batch.half()
+        return batch
+    
+    def _run_gpu(self, batch):
+        batch = batch.contiguous()
+        # ORT runs on its own stream; make sure the preprocessing kernels are done
+        torch.cuda.current_stream(self._device).synchronize()
+        binding = self.io_binding
+        binding.clear_binding_inputs()
+        binding.clear_binding_outputs()
+        binding.bind_input(self.input_name, 'cuda', self._device.index, self.input_dtype,
+                           tuple(batch.shape), batch.data_ptr())
+        binding.bind_output(self.output_name, 'cuda', self._device.index)
+        self.session.run_with_iobinding(binding)
+        return binding.copy_outputs_to_cpu()[0]
     
-    def __call__(self, frame, bboxes):
+    def __call__(self, frame, bboxes, bgr=False):
         """Extract features from frame crops using bboxes.
         
         Args:
-            frame: numpy array (H, W, C) in BGR format
+            frame: numpy array (H, W, C) in RGB format
             bboxes: list of [x, y, w, h] bounding boxes in tlwh format
+            bgr: frame is in BGR format; converted on the GPU when preprocessing
+                runs there, so callers can skip their own cv2.cvtColor
             
         Returns:
             features: numpy array (N, feature_dim)
         """
         if len(bboxes) == 0:
             return np.array([])
+        return self.extract_batch([(frame, bboxes, bgr)])[0]
+    
+    def extract_batch(self, requests):
+        """Extract features for the crops of several frames with a single inference.
         
-        # Crop patches from frame
-        patches = []
-        for bbox in bboxes:
-            x, y, w, h = bbox
-            x, y, w, h = int(x), int(y), int(w), int(h)
-            
-            # Ensure bbox is within frame bounds
-            h_frame, w_frame = frame.shape[:2]
-            x = max(0, x)
-            y = max(0, y)
-            w = min(w, w_frame - x)
-            h = min(h, h_frame - y)
+        Args:
+            requests: list of (frame, bboxes, bgr) tuples, as taken by __call__
             
-            if w > 0 and h > 0:
-                patch = frame[y:y+h, x:x+w]
-                patches.append(patch)
+        Returns:
+            list with one (len(bboxes), feature_dim) array per request
+        """
+        clipped = [self._clip_boxes(frame, bboxes) for frame, bboxes, _ in requests]
+        counts = [len(boxes) for boxes in clipped]
+        n = sum(counts)
+        if n == 0:
+            return [np.array([]) for _ in requests]
+        batch_size = self._padded_size(n)
+        
+        if self.gpu_preprocess and all(frame.ndim == 3 and frame.shape[2] == 3 for frame, _, _ in requests):
+            if len(requests) == 1:
+                (frame, _, bgr), = requests
+                batch = self.preprocess_gpu(frame, clipped[0], batch_size, bgr)
             else:
-                # Invalid bbox, use empty patch
-                patches.append(np.zeros((10, 10, 3), dtype=np.uint8))
-        
-        # Preprocess batch
-        batch = np.stack([self.preprocess(img) for img in patches], axis=0)
-        
-        # Run inference
-        features = self.session.run(
-            [self.output_name],
-            {self.input_name: batch}
-        )[0]
+                parts = [self.preprocess_gpu(frame, boxes, bgr=bgr)
+                         for (frame, _, bgr), boxes in zip(requests, clipped) if boxes]
+                if batch_size > n:
+                    parts.append(parts[0].new_zeros((batch_size - n,) + tuple(parts[0].shape[1:])))
+                batch = torch.cat(parts)
+            features = self._run_gpu(batch)
+        else:
+            # Crop patches from the frames
+            patches = []
+            for (frame, _, bgr), boxes in zip(requests, clipped):
+                if not boxes:
+                    continue
+                if bgr:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                for box in boxes:
+                    if box is not None:
+                        x, y, w, h = box
+                        patches.append(frame[y:y+h, x:x+w])
+                    else:
+                        # Invalid bbox, use empty patch
+                        patches.append(np.zeros((10, 10, 3), dtype=np.uint8))
+            
+            # Preprocess batch
+            batch = self.preprocess_batch(patches, batch_size).astype(self.input_dtype, copy=False)
+            
+            # Run inference
+            features = self.session.run(
+                [self.output_name],
+                {self.input_name: batch}
+            )[0]
         
-        return features
+        return np.split(features[:n], np.cumsum(counts)[:-1])
@@ -10,7 +10,8 @@ def export_onnx_to_tensorrt(
     engine_path,
     fp16=True,
     max_batch_size=32,
-    workspace_size=2048
+    workspace_size=2048,
+    static_batches=None
 ):
     """Export ONNX model to TensorRT engine.
     
@@ -20,6 +21,13 @@ def export_onnx_to_tensorrt(
         fp16: Enable FP16 precision (faster, slight accuracy loss)
         max_batch_size: Maximum batch size for dynamic batching
         workspace_size: Max workspace in MB (default 2GB)
+        static_batches: Optional list of batch sizes (e.g. [1, 4, 8, 16, 32]). One
+            optimization profile with min == opt == max is added per size, so
+            TensorRT picks kernels specialized for each exact shape instead of
+            one dynamic range. The engine file is built once, but it holds
+            tactics for every profile, so it grows with the number of sizes.
+            Callers pad a batch up to the nearest size and select the matching
+            profile. Overrides max_batch_size.
     """
     TRT_LOGGER = trt.Logger(trt.Logger.INFO)
     
@@ -50,30 +58,41 @@ def export_onnx_to_tensorrt(
     else:
         print("⚠ FP16 not available or disabled, using FP32")
     
-    # Dynamic batching optimization profile
-    profile = builder.create_optimization_profile()
-    
     # Assuming input name is 'input' with shape [batch, 3, 256, 128]
     input_name = network.get_input(0).name
     input_shape = network.get_input(0).shape
     
     print(f"Input: {input_name}, Shape: {input_shape}")
     
-    # Define min/opt/max batch sizes for dynamic batching
-    min_batch = 1
-    opt_batch = max_batch_size // 2
-    max_batch = max_batch_size
-    
-    # Set optimization profile for dynamic batch dimension
-    profile.set_shape(
-        input_name,
-        (min_batch, 3, 256, 128),  # min
-        (opt_batch, 3, 256, 128),  # optimal
-        (max_batch, 3, 256, 128)   # max
-    )
-    config.add_optimization_profile(profile)
-    
-    print(f"Building TensorRT engine (batch: {min_batch}-{max_batch})...")
+    if static_batches:
+        # One fully static profile per expected batch size
+        static_batches = sorted(set(static_batches))
+        for batch in static_batches:
+            profile = builder.create_optimization_profile()
+            shape = (batch, 3, 256, 128)
+            profile.set_shape(input_name, shape, shape, shape)
+            config.add_optimization_profile(profile)
+        min_batch, max_batch = static_batches[0], static_batches[-1]
+        print(f"Building TensorRT engine (static batch profiles: {static_batches})...")
+    else:
+        # Dynamic batching optimization profile
+        profile = builder.create_optimization_profile()
+        
+        # Define min/opt/max batch sizes for dynamic batching
+        min_batch = 1
+        opt_batch = max_batch_size // 2
+        max_batch = max_batch_size
+        
+        # Set optimization profile for dynamic batch dimension
+        profile.set_shape(
+            input_name,
+            (min_batch, 3, 256, 128),  # min
+            (opt_batch, 3, 256, 128),  # optimal
+            (max_batch, 3, 256, 128)   # max
+        )
+        config.add_optimization_profile(profile)
+        
+        print(f"Building TensorRT engine (batch: {min_batch}-{max_batch})...")
     print("This may take several minutes...")
     
     # Build engine
@@ -108,6 +127,8 @@ if __name__ == "__main__":
     parser.add_argument('--fp32', dest='fp16', action='store_false', help='Use FP32 precision')
     parser.add_argument('--max-batch', type=int, default=32, help='Maximum batch size')
     parser.add_argument('--workspace', type=int, default=2048, help='Workspace size in MB')
+    parser.add_argument('--static-batches', type=int, nargs='+', default=None,
+                        help='Build one static profile per batch size (e.g. 1 4 8 16 32)')
     
     args = parser.parse_args()
     
@@ -116,5 +137,6 @@ if __name__ == "__main__":
         args.output,
         fp16=args.fp16,
         max_batch_size=args.max_batch,
-        workspace_size=args.workspace
+        workspace_size=args.workspace,
+        static_batches=args.static_batches
     )
@@ -1,9 +1,178 @@
 """Test ONNX Runtime with TensorRT for EfficientNet-B0"""
 
+import glob
+import os
+import cv2
 import numpy as np
 import time
 import onnxruntime as ort
 
+ONNX_PATH = "models/efficientnetb0/model.onnx"
+# The same network taking uint8 RGB (N, 256, 128, 3) crops, built on the first run
+U8_ONNX_PATH = "models/efficientnetb0/model_u8.onnx"
+# EP-context wrapper embedding the built TensorRT engine (dumped on the first run)
+CTX_PATH = "models/efficientnetb0/model_u8_ctx_{precision}.onnx"
+TRT_CACHE_PATH = "./trt_cache"
+# Vehicle crops (any image format) used to calibrate INT8; INT8 is skipped without them
+CALIB_DIR = "datasets/reid_calib"
+# onnxruntime's (non-native) calibration table, looked up in TRT_CACHE_PATH
+CALIB_TABLE = "calibration.flatbuffers"
+BATCH_SIZE = 32
+INPUT_SHAPE = f"input_u8:{BATCH_SIZE}x256x128x3"
+ORT_VERSION = tuple(int(v) for v in ort.__version__.split(".")[:2])
+
+def build_uint8_model(onnx_path, out_path):
+    """Prepend the ReID preprocessing to the model so it takes uint8 RGB NHWC crops.
+    
+    Cast -> Transpose -> Sub(255 * mean) -> Mul(1 / (255 * std)) runs inside the
+    graph, where TensorRT fuses it into the first convolution, and the input
+    batch shrinks to a quarter of its float32 size.
+    """
+    import onnx
+    from onnx import TensorProto, compose, helper, numpy_helper
+    
+    model = onnx.load(onnx_path)
+    model_input = model.graph.input[0]
+    mean = (np.array([0.485, 0.456, 0.406]) * 255).astype(np.float32).reshape(1, 3, 1, 1)
+    inv_std = (1 / (np.array([0.229, 0.224, 0.225]) * 255)).astype(np.float32).reshape(1, 3, 1, 1)
+    nodes = [
+        helper.make_node('Cast', ['input_u8'], ['pre_float'], to=TensorProto.FLOAT),
+        helper.make_node('Transpose', ['pre_float'], ['pre_nchw'], perm=[0, 3, 1, 2]),
+        helper.make_node('Sub', ['pre_nchw', 'pre_mean'], ['pre_centered']),
+        helper.make_node('Mul', ['pre_centered', 'pre_inv_std'], ['pre_out']),
+    ]
+    # FP16 exports (onnx_exporter.py --half) take a half-precision input
+    elem_type = model_input.type.tensor_type.elem_type
+    if elem_type != TensorProto.FLOAT:
+        nodes[-1].output[0] = 'pre_out_float'
+        nodes.append(helper.make_node('Cast', ['pre_out_float'], ['pre_out'], to=elem_type))
+    graph = helper.make_graph(
+        nodes, 'preprocess',
+        [helper.make_tensor_value_info('input_u8', TensorProto.UINT8, ['batch_size', 256, 128, 3])],
+        [helper.make_tensor_value_info('pre_out', elem_type, ['batch_size', 3, 256, 128])],
+        initializer=[numpy_helper.from_array(mean, 'pre_mean'),
+                     numpy_helper.from_array(inv_std, 'pre_inv_std')])
+    preprocess = helper.make_model(graph, opset_imports=model.opset_import, ir_version=model.ir_version)
+    onnx.save(compose.merge_models(preprocess, model, io_map=[('pre_out', model_input.name)]), out_path)
+    print(f"✓ Saved uint8-input model to {out_path}")
+
+def load_calibration_batches(calib_dir, batch_size=BATCH_SIZE, max_batches=8):
+    """Resize crops from calib_dir into (batch_size, 256, 128, 3) uint8 RGB batches."""
+    paths = sorted(glob.glob(os.path.join(calib_dir, "*")))[:batch_size * max_batches]
+    crops = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        crops.append(cv2.cvtColor(cv2.resize(img, (128, 256)), cv2.COLOR_BGR2RGB))
+    n = len(crops) // batch_size * batch_size
+    return [np.stack(crops[i:i + batch_size]) for i in range(0, n, batch_size)]
+
+def prepare_int8_calibration(onnx_path):
+    """Make sure the INT8 calibration table exists, building it from CALIB_DIR if needed.
+    
+    Returns False (INT8 disabled) when there is no table and no calibration data.
+    """
+    if os.path.exists(os.path.join(TRT_CACHE_PATH, CALIB_TABLE)):
+        return True
+    batches = load_calibration_batches(CALIB_DIR) if os.path.isdir(CALIB_DIR) else []
+    if not batches:
+        print(f"No INT8 calibration table or data in {CALIB_DIR}, using FP16")
+        return False
+    
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod,
+                                          create_calibrator, write_calibration_table)
+    
+    class Reader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.feeds = iter([{input_name: b} for b in batches])
+        
+        def get_next(self):
+            return next(self.feeds, None)
+    
+    print(f"Calibrating INT8 on {len(batches) * BATCH_SIZE} crops from {CALIB_DIR}...")
+    os.makedirs(TRT_CACHE_PATH, exist_ok=True)
+    calibrator = create_calibrator(onnx_path, [],
+                                   augmented_model_path=os.path.join(TRT_CACHE_PATH, "augmented_model.onnx"),
+                                   calibrate_method=CalibrationMethod.Entropy)
+    calibrator.set_execution_providers(['CUDAExecutionProvider'])
+    # The input name comes from the graph: a session without providers= raises on GPU builds
+    import onnx
+    calibrator.collect_data(Reader(onnx.load(onnx_path).graph.input[0].name))
+    write_calibration_table(calibrator.compute_data(), dir=TRT_CACHE_PATH)
+    return True
+
+def trt_provider_options(int8=False):
+    """TensorRT EP options for the fixed benchmark shape."""
+    precision = 'int8' if int8 else 'fp16'
+    ctx_path = CTX_PATH.format(precision=precision)
+    options = {
+        'trt_fp16_enable': True,
+        'trt_engine_cache_enable': True,
+        'trt_engine_cache_path': TRT_CACHE_PATH,
+        # The shape never changes: a single min == opt == max profile lets
+        # TensorRT fully specialize the engine
+        'trt_profile_min_shapes': INPUT_SHAPE,
+        'trt_profile_opt_shapes': INPUT_SHAPE,
+        'trt_profile_max_shapes': INPUT_SHAPE,
+    }
+    if ORT_VERSION >= (1, 16):
+        # Static shape and IOBinding with fixed buffers: the whole engine can be
+        # captured once and replayed as a single CUDA graph launch
+        options['trt_cuda_graph_enable'] = True
+    if int8:
+        # FP16 stays enabled for layers without INT8 kernels
+        options.update({
+            'trt_int8_enable': True,
+            'trt_int8_calibration_table_name': CALIB_TABLE,
+            'trt_int8_use_native_calibration_table': False,
+        })
+    if ORT_VERSION >= (1, 17):
+        options['trt_engine_cache_prefix'] = f'effb0_b{BATCH_SIZE}_{precision}'
+        if not os.path.exists(ctx_path):
+            # Dump an EP-context model with the engine embedded; later runs load it
+            # and skip ONNX parsing and the engine build entirely
+            options.update({
+                'trt_dump_ep_context_model': True,
+                'trt_ep_context_embed_mode': 1,
+                'trt_ep_context_file_path': ctx_path,
+            })
+    return options
+
+def make_io_binding(session, input_name, output_name, data):
+    """Bind preallocated CUDA input/output buffers to session, uploading data once.
+    
+    Runs through run_with_iobinding then reuse the device buffers instead of
+    copying the input batch host -> device on every call.
+    """
+    input_ort = ort.OrtValue.ortvalue_from_numpy(data, 'cuda', 0)
+    output_shape = [data.shape[0], session.get_outputs()[0].shape[1]]
+    output_ort = ort.OrtValue.ortvalue_from_shape_and_type(output_shape, np.float32, 'cuda', 0)
+    binding = session.io_binding()
+    binding.bind_ortvalue_input(input_name, input_ort)
+    binding.bind_ortvalue_output(output_name, output_ort)
+    return binding, output_ort
+
+def benchmark(session, binding, num_runs):
+    """Time num_runs inferences one by one; returns per-batch latencies in seconds.
+    
+    run_with_iobinding returns only after the bound outputs are ready, so each
+    perf_counter interval covers the complete GPU work of one batch.
+    """
+    latencies = np.empty(num_runs)
+    for i in range(num_runs):
+        start = time.perf_counter()
+        session.run_with_iobinding(binding)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+def print_latencies(latencies, batch_size):
+    median = np.median(latencies)
+    print(f"✓ Total time: {latencies.sum():.3f}s")
+    print(f"✓ Time per batch: {median*1000:.2f}ms median, "
+          f"{latencies.mean()*1000:.2f}ms mean, {np.percentile(latencies, 90)*1000:.2f}ms p90")
+    print(f"✓ Throughput: {batch_size / median:.1f} images/sec")
+
 def test_tensorrt():
     print("=" * 70)
     print("Testing EfficientNet-B0 ONNX with TensorRT")
@@ -12,53 +181,57 @@ def test_tensorrt():
     # Show available providers
     print(f"\nAvailable providers: {ort.get_available_providers()}\n")
     
-    onnx_path = "models/efficientnetb0/model.onnx"
+    onnx_path = U8_ONNX_PATH
+    if not os.path.exists(onnx_path):
+        build_uint8_model(ONNX_PATH, onnx_path)
+    int8 = prepare_int8_calibration(onnx_path)
+    ctx_path = CTX_PATH.format(precision='int8' if int8 else 'fp16')
+    trt_model_path = ctx_path if os.path.exists(ctx_path) else onnx_path
     
     # Test 1: TensorRT provider
-    print("Test 1: TensorRT Execution Provider")
+    print(f"Test 1: TensorRT Execution Provider ({'INT8' if int8 else 'FP16'})")
     print("-" * 70)
     providers = [
-        ('TensorrtExecutionProvider', {
-            'trt_fp16_enable': True,
-            'trt_engine_cache_enable': True,
-            'trt_engine_cache_path': './trt_cache',
-        }),
+        ('TensorrtExecutionProvider', trt_provider_options(int8)),
         'CUDAExecutionProvider',
         'CPUExecutionProvider'
     ]
     
+    # TensorRT optimizes the subgraphs it owns itself; ORT-level rewrites only add
+    # startup time and can break TensorRT's own fusions
+    sess_options_trt = ort.SessionOptions()
+    sess_options_trt.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
     sess_options = ort.SessionOptions()
     sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
     
-    session_trt = ort.InferenceSession(onnx_path, sess_options=sess_options, providers=providers)
+    print(f"Loading {trt_model_path}")
+    session_trt = ort.InferenceSession(trt_model_path, sess_options=sess_options_trt, providers=providers)
     print(f"Active provider: {session_trt.get_providers()[0]}")
     
     # Prepare test input
-    batch_size = 32
+    batch_size = BATCH_SIZE
     input_name = session_trt.get_inputs()[0].name
     output_name = session_trt.get_outputs()[0].name
-    dummy_input = np.random.randn(batch_size, 3, 256, 128).astype(np.float32)
+    dummy_input = np.random.randint(0, 256, (batch_size, 256, 128, 3), dtype=np.uint8)
+    # The benchmark input never changes, so it is uploaded once and stays bound
+    binding_trt, output_trt = make_io_binding(session_trt, input_name, output_name, dummy_input)
     
     # Warmup (TensorRT builds engine on first run)
     print(f"\nWarming up with batch size {batch_size}... (TensorRT engine building)")
     for _ in range(3):
-        session_trt.run([output_name], {input_name: dummy_input})
+        session_trt.run_with_iobinding(binding_trt)
     print("✓ Warmup complete")
     
     # Benchmark
     num_runs = 100
     print(f"\nBenchmarking {num_runs} runs...")
-    start = time.time()
-    for _ in range(num_runs):
-        features = session_trt.run([output_name], {input_name: dummy_input})[0]
-    elapsed = time.time() - start
+    latencies = benchmark(session_trt, binding_trt, num_runs)
+    features = output_trt.numpy()
     
     print(f"✓ Output shape: {features.shape}")
-    print(f"✓ Total time: {elapsed:.3f}s")
-    print(f"✓ Time per batch: {elapsed/num_runs*1000:.2f}ms")
-    print(f"✓ Throughput: {num_runs * batch_size / elapsed:.1f} images/sec")
+    print_latencies(latencies, batch_size)
     
-    trt_time = elapsed / num_runs
+    trt_time = np.median(latencies)
     
     # Test 2: CUDA provider (for comparison)
     print("\n" + "=" * 70)
@@ -68,35 +241,31 @@ def test_tensorrt():
     session_cuda = ort.InferenceSession(
         onnx_path, 
         sess_options=sess_options, 
-        providers=['CUDAExecutionProvider', 'CPUExecutionProvider']
+        providers=[('CUDAExecutionProvider', {'enable_cuda_graph': True}), 'CPUExecutionProvider']
     )
     print(f"Active provider: {session_cuda.get_providers()[0]}")
     
+    binding_cuda, _ = make_io_binding(session_cuda, input_name, output_name, dummy_input)
+    
     # Warmup
     print(f"\nWarming up with batch size {batch_size}...")
     for _ in range(3):
-        session_cuda.run([output_name], {input_name: dummy_input})
+        session_cuda.run_with_iobinding(binding_cuda)
     print("✓ Warmup complete")
     
     # Benchmark
     print(f"\nBenchmarking {num_runs} runs...")
-    start = time.time()
-    for _ in range(num_runs):
-        features = session_cuda.run([output_name], {input_name: dummy_input})[0]
-    elapsed = time.time() - start
-    
-    print(f"✓ Total time: {elapsed:.3f}s")
-    print(f"✓ Time per batch: {elapsed/num_runs*1000:.2f}ms")
-    print(f"✓ Throughput: {num_runs * batch_size / elapsed:.1f} images/sec")
+    latencies = benchmark(session_cuda, binding_cuda, num_runs)
+    print_latencies(latencies, batch_size)
     
-    cuda_time = elapsed / num_runs
+    cuda_time = np.median(latencies)
     
     # Summary
     print("\n" + "=" * 70)
     print("Performance Summary")
     print("=" * 70)
-    print(f"TensorRT:  {trt_time*1000:.2f}ms per batch ({batch_size} images)")
-    print(f"CUDA:      {cuda_time*1000:.2f}ms per batch ({batch_size} images)")
+    print(f"TensorRT:  {trt_time*1000:.2f}ms median per batch ({batch_size} images)")
+    print(f"CUDA:      {cuda_time*1000:.2f}ms median per batch ({batch_size} images)")
     print(f"Speedup:   {cuda_time/trt_time:.2f}x faster with TensorRT")
     print("=" * 70)
 
@@ -0,0 +1,86 @@
+import threading
+
+from mtmc.run_live_mtmc import VirtualClock
+
+
+def wait_in_thread(clock, worker, last_seen):
+    """Call clock.wait_for_tick on a new thread; returns (result dict, thread)."""
+    result = {}
+
+    def waiter():
+        result["tick"] = clock.wait_for_tick(worker, last_seen)
+
+    thread = threading.Thread(target=waiter, daemon=True)
+    thread.start()
+    return result, thread
+
+
+def start_blocked_clock(stall_seconds=60):
+    """A clock at tick 3 where worker 'a' waits on worker 'b' at tick 1."""
+    clock = VirtualClock(0.01, max_skew=1, stall_seconds=stall_seconds, worker_names=["a", "b"])
+    # Running without the ticking thread, so only the call under test can wake 'a'
+    clock._running = True
+    clock._tick = 3
+    clock.mark("a", 1)
+    result, thread = wait_in_thread(clock, "a", 1)
+    return clock, result, thread
+
+
+def test_wait_wakes_on_tick():
+    clock = VirtualClock(0.05, max_skew=1, stall_seconds=60, worker_names=["a"])
+    clock.start()
+    try:
+        result, thread = wait_in_thread(clock, "a", clock.tick)
+        thread.join(timeout=2)
+        assert not thread.is_alive()
+        assert result["tick"] >= 1
+    finally:
+        clock.stop()
+
+
+def test_wait_blocks_until_mark():
+    clock, result, thread = start_blocked_clock()
+    try:
+        thread.join(timeout=0.2)
+        assert thread.is_alive()  # 'b' is still at tick 0
+        clock.mark("b", 1)
+        thread.join(timeout=2)
+        assert not thread.is_alive()
+        assert result["tick"] == 2
+    finally:
+        clock.stop()
+
+
+def test_wait_wakes_on_retire():
+    clock, result, thread = start_blocked_clock()
+    try:
+        thread.join(timeout=0.2)
+        assert thread.is_alive()
+        clock.retire("b")
+        thread.join(timeout=2)
+        assert not thread.is_alive()
+        assert result["tick"] > 1
+    finally:
+        clock.stop()
+
+
+def test_stale_worker_dropped():
+    clock, result, thread = start_blocked_clock(stall_seconds=0.3)
+    try:
+        # 'b' never marks: once it stalls it no longer holds back 'a'
+        thread.join(timeout=3)
+        assert not thread.is_alive()
+        assert result["tick"] > 1
+        assert "b" not in clock._seen
+    finally:
+        clock.stop()
+
+
+def test_stop_releases_waiters():
+    clock, result, thread = start_blocked_clock()
+    thread.join(timeout=0.2)
+    assert thread.is_alive()
+    clock.stop()
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    assert result["tick"] is None
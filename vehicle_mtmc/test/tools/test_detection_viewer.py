@@ -0,0 +1,70 @@
+import random
+
+from tools.detection_viewer import pop_jpeg
+
+
+def jpeg(i):
+    return b'\xff\xd8' + bytes([i]) * 40 + b'\xff\xd9'
+
+
+def part(i):
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg(i) + b'\r\n'
+
+
+def new_stream(data=b''):
+    return {'bytes': bytearray(data), 'scanned': 0}
+
+
+def test_pop_jpeg_incomplete():
+    s = new_stream(part(0)[:-10])
+    assert pop_jpeg(s) is None
+    s['bytes'].extend(part(0)[-10:])
+    assert pop_jpeg(s) == jpeg(0)
+    assert pop_jpeg(s) is None
+
+
+def test_pop_jpeg_returns_newest():
+    s = new_stream(b''.join(part(i) for i in range(4)) + part(4)[:30])
+    assert pop_jpeg(s) == jpeg(3)
+    # the partial frame is kept for the next call
+    assert pop_jpeg(s) is None
+    s['bytes'].extend(part(4)[30:])
+    assert pop_jpeg(s) == jpeg(4)
+
+
+def test_pop_jpeg_split_markers():
+    # split inside the end marker of the newest frame, then inside its start marker
+    data = part(1) + part(2)
+    end = data.rindex(b'\xff\xd9')
+    s = new_stream(data[:end + 1])
+    assert pop_jpeg(s) == jpeg(1)
+    s['bytes'].extend(data[end + 1:])
+    assert pop_jpeg(s) == jpeg(2)
+
+    data = part(3)
+    start = data.index(b'\xff\xd8')
+    s = new_stream(data[:start + 1])
+    assert pop_jpeg(s) is None
+    s['bytes'].extend(data[start + 1:])
+    assert pop_jpeg(s) == jpeg(3)
+
+
+def test_pop_jpeg_random_chunks():
+    rng = random.Random(0)
+    data = b''.join(part(i) for i in range(50))
+    s = new_stream()
+    popped = []
+    pos = 0
+    while pos < len(data):
+        n = rng.randint(1, 120)
+        s['bytes'].extend(data[pos:pos + n])
+        pos += n
+        jpg = pop_jpeg(s)
+        if jpg is not None:
+            popped.append(jpg)
+    # only whole frames, in stream order, ending with the last one
+    frames = [jpeg(i) for i in range(50)]
+    assert all(jpg in frames for jpg in popped)
+    order = [frames.index(jpg) for jpg in popped]
+    assert order == sorted(set(order))
+    assert popped[-1] == jpeg(49)
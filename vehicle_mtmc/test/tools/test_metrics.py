@@ -1,6 +1,6 @@
 import math
 import numpy as np
-from tools.metrics import iou, euclidean_dist, cosine_sim
+from tools.metrics import iou, euclidean_dist, cosine_sim, cosine_sim_matrix
 
 EPS = 1e6
 
@@ -33,3 +33,12 @@ def test_cosine():
     v2 = np.array([4, -4])
     exp_score = math.sqrt(2) / 2
     assert abs(cosine_sim(v1, v2) - exp_score) < EPS
+
+def test_cosine_matrix():
+    a = np.array([[0, -4], [3, 0], [1, 1]])
+    b = np.array([[4, -4], [0, 2]])
+    sims = cosine_sim_matrix(a, b)
+    assert sims.shape == (3, 2)
+    for i in range(len(a)):
+        for j in range(len(b)):
+            assert abs(sims[i, j] - cosine_sim(a[i], b[j])) < 1e-6
@@ -1,36 +1,18 @@
 """Simple HTTP stream viewer with YOLO detection - no tracking."""
 import cv2
-import numpy as np
-import torch
-from ultralytics import YOLO
-import urllib.request
 import time
+import queue
+
+from tools.detection_viewer import (PREDICT_ARGS, close_streams, draw_label, load_model,
+                                    make_label_images, open_streams, start_readers)
 
-def read_http_frame(stream, stream_bytes):
-    """Read a single frame from HTTP MJPEG stream."""
-    try:
-        while True:
-            chunk = stream.read(4096)
-            if not chunk:
-                return False, None, stream_bytes
-            stream_bytes += chunk
-            a = stream_bytes.find(b'\xff\xd8')  # JPEG start
-            b = stream_bytes.find(b'\xff\xd9')  # JPEG end
-            if a != -1 and b != -1:
-                jpg = stream_bytes[a:b+2]
-                stream_bytes = stream_bytes[b+2:]
-                frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
-                if frame is not None:
-                    return True, frame, stream_bytes
-    except Exception as e:
-        print(f"Error reading stream: {e}")
-        return False, None, stream_bytes
 
 def main():
     # Load YOLO model
     print("Loading YOLO model...")
-    model = YOLO('yolov8s.pt')
-    model.to('cuda:0')
+    model = load_model('yolov8s.pt', 'cuda:0', batch=2)
+    names = [model.names[i] for i in range(len(model.names))]
+    label_imgs = make_label_images(names)
     
     # Open HTTP streams
     streams = [
@@ -38,14 +20,10 @@ def main():
         {'url': 'http://localhost:5070/stream', 'name': 'cam_2'},
     ]
     
-    for s in streams:
-        try:
-            s['stream'] = urllib.request.urlopen(s['url'], timeout=10)
-            s['bytes'] = b''
-            print(f"✓ Opened {s['name']}: {s['url']}")
-        except Exception as e:
-            print(f"✗ Failed to open {s['name']}: {e}")
-            s['stream'] = None
+    open_streams(streams)
+    
+    # Frames are fetched and decoded in the background while the GPU runs detection
+    start_readers(streams)
     
     print("\nStarting detection... Press 'q' to quit")
     
@@ -53,38 +31,46 @@ def main():
     last_time = time.time()
     
     try:
+        ready, frames = [], []  # reused every iteration
         while True:
+            # Take a queued frame from every stream that has one, then detect on all
+            # of them in one call (wait briefly only until the first frame shows up)
+            ready.clear()
+            frames.clear()
             for s in streams:
-                if s['stream'] is None:
+                if s['queue'] is None:
                     continue
-                
-                # Read frame
-                ret, frame, s['bytes'] = read_http_frame(s['stream'], s['bytes'])
-                if not ret or frame is None:
+                try:
+                    frame = s['queue'].get_nowait() if frames else s['queue'].get(timeout=0.05)
+                except queue.Empty:
                     continue
-                
-                # Run detection
-                results = model.predict(frame, verbose=False, device='cuda:0', conf=0.25)
-                
+                if frame is None:  # stream ended
+                    s['queue'] = None
+                    continue
+                ready.append(s)
+                frames.append(frame)
+            
+            # Run detection (one batched predict for all cameras)
+            batch_results = model.predict(frames, device='cuda:0', **PREDICT_ARGS) if frames else []
+            for s, frame, result in zip(ready, frames, batch_results):
                 # Draw bounding boxes
-                annotated = frame.copy()
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    conf = float(box.conf[0])
-                    cls = int(box.cls[0])
-                    label = f"{model.names[cls]} {conf:.2f}"
-                    
+                annotated = frame  # the raw frame is not used after drawing
+                # Three bulk device -> host copies instead of three per box
+                boxes = result.boxes
+                xyxy = boxes.xyxy.cpu().numpy().astype(int)
+                confs = boxes.conf.cpu().numpy()
+                cls_ids = boxes.cls.cpu().numpy().astype(int)
+                for (x1, y1, x2, y2), conf, cls in zip(xyxy.tolist(), confs.tolist(), cls_ids.tolist()):
                     # Draw box
                     cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(annotated, label, (x1, y1 - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                    draw_label(annotated, label_imgs, names, cls, conf, x1, y1 - 10)
                 
                 # Calculate FPS
                 frame_count += 1
                 if frame_count % 30 == 0:
                     fps = 30 / (time.time() - last_time)
                     last_time = time.time()
-                    print(f"{s['name']}: {fps:.1f} FPS, {len(results[0].boxes)} detections")
+                    print(f"{s['name']}: {fps:.1f} FPS, {len(result.boxes)} detections")
                 
                 # Display
                 cv2.imshow(s['name'], annotated)
@@ -95,9 +81,7 @@ def main():
     except KeyboardInterrupt:
         print("\nStopping...")
     finally:
-        for s in streams:
-            if s['stream']:
-                s['stream'].close()
+        close_streams(streams)
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
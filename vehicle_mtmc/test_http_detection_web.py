@@ -1,24 +1,45 @@
 """Simple HTTP stream viewer with YOLO detection - outputs to MJPEG server."""
 import cv2
-import numpy as np
-import torch
-from ultralytics import YOLO
-import urllib.request
 import time
+import queue
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import socket
 import threading
+from collections import defaultdict
+
+from tools.detection_viewer import (PREDICT_ARGS, close_streams, draw_label, load_model,
+                                    make_label_images, open_streams, start_readers)
+from tools.util import put_latest
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR  # libjpeg-turbo encoding, optional
+except ImportError:
+    TurboJPEG = None
+
+LABEL_FONT_SCALE = 0.7  # labels on the streamed frames are drawn larger
 
 class SimpleDetectionServer:
     def __init__(self, port=8170):
         self.port = port
         self.frames = {}
+        # Per-camera condition and frame sequence number, so handlers sleep until
+        # their camera publishes and send every frame exactly once
+        self._conds = defaultdict(threading.Condition)
+        self._seq = defaultdict(int)
         self._lock = threading.Lock()
         self._server = None
         self._running = threading.Event()
+    
+    def _cond(self, name):
+        with self._lock:
+            return self._conds[name]
         
     def update_frame(self, name, frame_bytes):
-        with self._lock:
+        cond = self._cond(name)
+        with cond:
             self.frames[name] = frame_bytes
+            self._seq[name] += 1
+            cond.notify_all()
     
     def _handler_factory(self):
         outer = self
@@ -26,6 +47,11 @@ class SimpleDetectionServer:
         class Handler(BaseHTTPRequestHandler):
             def log_message(self, format, *args):
                 pass  # Suppress logs
+            
+            def setup(self):
+                super().setup()
+                # Each frame goes out as one write; don't hold it back for Nagle
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 
             def do_GET(self):
                 path = self.path.lstrip("/")
@@ -47,18 +73,22 @@ class SimpleDetectionServer:
                 self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={boundary}")
                 self.end_headers()
                 
+                boundary_bytes = boundary.encode()
+                cond = outer._cond(cam_name)
+                last_seen = 0
                 try:
                     while outer._running.is_set():
-                        with outer._lock:
+                        with cond:
+                            cond.wait_for(lambda: outer._seq[cam_name] != last_seen, timeout=1.0)
+                            seq = outer._seq[cam_name]
                             buf = outer.frames.get(cam_name)
-                        if buf is None:
-                            time.sleep(0.05)
+                        if seq == last_seen or buf is None:
+                            last_seen = seq
                             continue
-                        self.wfile.write(boundary.encode() + b"\r\n")
-                        self.wfile.write(b"Content-Type: image/jpeg\r\n")
-                        self.wfile.write(f"Content-Length: {len(buf)}\r\n\r\n".encode())
-                        self.wfile.write(buf + b"\r\n")
-                        time.sleep(0.001)
+                        last_seen = seq
+                        # Boundary, part headers and payload in a single send
+                        self.wfile.write(b"%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%s\r\n"
+                                         % (boundary_bytes, len(buf), buf))
                 except:
                     pass
         return Handler
@@ -71,30 +101,46 @@ class SimpleDetectionServer:
         thread.start()
         print(f"✓ Server started on http://localhost:{self.port}/")
 
-def read_http_frame(stream, stream_bytes):
-    """Read a single frame from HTTP MJPEG stream."""
-    try:
+def make_jpeg_encoder(quality=85):
+    """Return a function encoding a BGR frame to JPEG bytes.
+    
+    Uses libjpeg-turbo through PyTurboJPEG when it is installed, otherwise
+    cv2.imencode.
+    """
+    if TurboJPEG is not None:
+        try:
+            jpeg = TurboJPEG()
+            return lambda frame: jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+        except Exception as e:  # shared library not found
+            print(f"TurboJPEG unavailable ({e}), using cv2.imencode")
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    return lambda frame: cv2.imencode('.jpg', frame, params)[1].tobytes()
+
+def start_encoder(server, name, quality=85):
+    """Encode and publish the annotated frames of one camera on its own thread.
+    
+    Returns the camera's frame queue, which holds at most the two newest frames
+    (older ones are dropped): frames are published in order, and encoding that
+    falls behind detection does not pile them up. Queue None to stop the thread.
+    """
+    q = queue.Queue(maxsize=2)
+    encode_jpeg = make_jpeg_encoder(quality)  # one encoder per thread
+    
+    def encoder():
         while True:
-            chunk = stream.read(4096)
-            if not chunk:
-                return False, None, stream_bytes
-            stream_bytes += chunk
-            a = stream_bytes.find(b'\xff\xd8')
-            b = stream_bytes.find(b'\xff\xd9')
-            if a != -1 and b != -1:
-                jpg = stream_bytes[a:b+2]
-                stream_bytes = stream_bytes[b+2:]
-                frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
-                if frame is not None:
-                    return True, frame, stream_bytes
-    except Exception as e:
-        print(f"Error: {e}")
-        return False, None, stream_bytes
+            frame = q.get()
+            if frame is None:
+                return
+            server.update_frame(name, encode_jpeg(frame))
+    
+    threading.Thread(target=encoder, name=f"encoder_{name}", daemon=True).start()
+    return q
 
 def main():
     print("Loading YOLO model...")
-    model = YOLO('yolov8s.pt')
-    model.to('cuda:0')
+    model = load_model('yolov8s.pt', 'cuda:0', batch=2)
+    names = [model.names[i] for i in range(len(model.names))]
+    label_imgs = make_label_images(names, LABEL_FONT_SCALE)
     print("✓ Model loaded")
     
     server = SimpleDetectionServer(port=8170)
@@ -105,55 +151,65 @@ def main():
         {'url': 'http://localhost:5070/stream', 'name': 'cam_2'},
     ]
     
-    for s in streams:
-        try:
-            s['stream'] = urllib.request.urlopen(s['url'], timeout=10)
-            s['bytes'] = b''
-            print(f"✓ Opened {s['name']}")
-        except Exception as e:
-            print(f"✗ Failed {s['name']}: {e}")
-            s['stream'] = None
+    open_streams(streams)
+    
+    # Frames are fetched and decoded in the background while the GPU runs detection
+    start_readers(streams)
     
     print("\nProcessing... Access http://localhost:8170/ to view")
     print("Press Ctrl+C to stop\n")
     
+    encode_queues = {s['name']: start_encoder(server, s['name'], quality=85)
+                     for s in streams if s['queue'] is not None}
+    
     frame_counts = {s['name']: 0 for s in streams}
     last_times = {s['name']: time.time() for s in streams}
     
     try:
+        ready, frames = [], []  # reused every iteration
         while True:
+            # Take a queued frame from every stream that has one, then detect on all
+            # of them in one call (wait briefly only until the first frame shows up)
+            ready.clear()
+            frames.clear()
             for s in streams:
-                if s['stream'] is None:
+                if s['queue'] is None:
                     continue
-                
-                ret, frame, s['bytes'] = read_http_frame(s['stream'], s['bytes'])
-                if not ret or frame is None:
+                try:
+                    frame = s['queue'].get_nowait() if frames else s['queue'].get(timeout=0.05)
+                except queue.Empty:
                     continue
-                
-                # Detect
-                results = model.predict(frame, verbose=False, device='cuda:0', conf=0.25,
-                                       classes=[2, 3, 5, 7])  # car, motorcycle, bus, truck
-                
+                if frame is None:  # stream ended
+                    s['queue'] = None
+                    continue
+                ready.append(s)
+                frames.append(frame)
+            
+            if not frames:
+                continue
+            
+            # Detect (one batched predict for all cameras)
+            batch_results = model.predict(frames, device='cuda:0', **PREDICT_ARGS)
+            for s, frame, result in zip(ready, frames, batch_results):
                 # Draw
-                annotated = frame.copy()
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    conf = float(box.conf[0])
-                    cls = int(box.cls[0])
-                    label = f"{model.names[cls]} {conf:.2f}"
-                    
+                annotated = frame  # the raw frame is not used after drawing
+                # Three bulk device -> host copies instead of three per box
+                boxes = result.boxes
+                xyxy = boxes.xyxy.cpu().numpy().astype(int)
+                confs = boxes.conf.cpu().numpy()
+                cls_ids = boxes.cls.cpu().numpy().astype(int)
+                for (x1, y1, x2, y2), conf, cls in zip(xyxy.tolist(), confs.tolist(), cls_ids.tolist()):
                     cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 3)
-                    cv2.putText(annotated, label, (x1, y1 - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    draw_label(annotated, label_imgs, names, cls, conf, x1, y1 - 10,
+                               LABEL_FONT_SCALE)
                 
                 # Add info text
-                det_count = len(results[0].boxes)
+                det_count = len(result.boxes)
                 cv2.putText(annotated, f"Detections: {det_count}", (10, 30),
                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
                 
-                # Encode and update
-                _, buf = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                server.update_frame(s['name'], buf.tobytes())
+                # Encode and update off the detection thread
+                put_latest(encode_queues[s['name']], annotated)
                 
                 # FPS
                 frame_counts[s['name']] += 1
@@ -165,9 +221,9 @@ def main():
     except KeyboardInterrupt:
         print("\nStopping...")
     finally:
-        for s in streams:
-            if s['stream']:
-                s['stream'].close()
+        for q in encode_queues.values():
+            put_latest(q, None)
+        close_streams(streams)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,297 @@
+"""Helpers shared by the HTTP stream detection viewers (test_http_detection*.py):
+MJPEG stream reading, JPEG decoding, detector loading and box label drawing."""
+import os
+import queue
+import select
+import socket
+import threading
+import urllib.parse
+
+import cv2
+import numpy as np
+
+from tools.util import put_latest
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+try:
+    from nvidia import nvimgcodec  # GPU (nvJPEG) decoding, optional
+except ImportError:
+    nvimgcodec = None
+
+# Only the work the viewers need: a smaller input, vehicle classes (car, motorcycle,
+# bus, truck) and few boxes per frame
+IMGSZ = 480
+PREDICT_ARGS = dict(imgsz=IMGSZ, conf=0.25, iou=0.5, max_det=50, half=True, classes=[2, 3, 5, 7],
+                    agnostic_nms=True, augment=False, verbose=False)
+
+LABEL_FONT_SCALE = 0.5
+LABEL_PAD = 2  # room for glyph strokes reaching past the text origin
+
+
+def open_http_stream(url, timeout=10):
+    """Open an HTTP MJPEG stream; returns a non-blocking socket and the body bytes received.
+
+    The request is sent as HTTP/1.0 so the server streams the body as-is rather than
+    chunk-encoded, letting the raw socket data go straight to the JPEG parser.
+    """
+    url = urllib.parse.urlsplit(url)
+    path = url.path or '/'
+    if url.query:
+        path += '?' + url.query
+    sock = socket.create_connection((url.hostname, url.port or 80), timeout=timeout)
+    try:
+        sock.sendall(f"GET {path} HTTP/1.0\r\nHost: {url.netloc}\r\n\r\n".encode())
+        data = bytearray()
+        while b'\r\n\r\n' not in data:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("connection closed before the response headers")
+            data.extend(chunk)
+        status = data[:data.index(b'\r\n')].decode('latin-1')
+        if status.split()[1:2] != ['200']:
+            raise ConnectionError(f"unexpected response: {status}")
+        del data[:data.index(b'\r\n\r\n') + 4]
+    except BaseException:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return sock, data
+
+
+def open_streams(streams):
+    """Open every stream of the list, setting s['sock'] (None when it failed to open)."""
+    for s in streams:
+        s['queue'] = None
+        try:
+            s['sock'], s['bytes'] = open_http_stream(s['url'])
+            s['scanned'] = 0
+            print(f"✓ Opened {s['name']}: {s['url']}")
+        except Exception as e:
+            print(f"✗ Failed to open {s['name']}: {e}")
+            s['sock'] = None
+
+
+def close_streams(streams):
+    for s in streams:
+        if s.get('sock'):
+            s['sock'].close()
+
+
+def pop_jpeg(s):
+    """Remove the complete JPEGs from s['bytes'] and return the newest one (None if none).
+
+    Older complete frames are dropped, so a consumer that falls behind the stream
+    skips to the freshest frame instead of working through a backlog.
+
+    The end marker is searched only in bytes not searched by earlier calls (plus one
+    byte of overlap for a marker split across receives), so a frame spanning many
+    receives is scanned once.
+    """
+    stream_bytes = s['bytes']
+    a = stream_bytes.find(b'\xff\xd8')  # JPEG start, near the front of the buffer
+    if a != -1:
+        b = stream_bytes.find(b'\xff\xd9', max(a + 2, s['scanned'] - 1))  # JPEG end
+        if b != -1:
+            # Skip ahead to the last complete frame in the buffer
+            while True:
+                a2 = stream_bytes.find(b'\xff\xd8', b + 2)
+                b2 = stream_bytes.find(b'\xff\xd9', a2 + 2) if a2 != -1 else -1
+                if b2 == -1:
+                    break
+                a, b = a2, b2
+            jpg = bytes(stream_bytes[a:b+2])
+            del stream_bytes[:b+2]  # reuses the buffer's allocation
+            s['scanned'] = len(stream_bytes)  # the rest was searched by the loop
+            return jpg
+    s['scanned'] = len(stream_bytes)
+    return None
+
+
+def read_http_frame(s):
+    """Read the JPEG bytes of a single frame from HTTP MJPEG stream s.
+
+    s['sock'] is a non-blocking socket and s['bytes'] a bytearray holding the not yet
+    consumed stream data. The newest frame already buffered is returned without
+    touching the socket, otherwise at most one recv() is made, so this never blocks.
+
+    Returns (ok, jpg): ok is False once the stream ended, jpg is None while no complete
+    frame has arrived yet.
+    """
+    jpg = pop_jpeg(s)
+    if jpg is not None:
+        return True, jpg
+    try:
+        chunk = s['sock'].recv(65536)
+    except BlockingIOError:
+        return True, None
+    except OSError as e:
+        print(f"Error reading {s['name']}: {e}")
+        return False, None
+    if not chunk:
+        return False, None
+    s['bytes'].extend(chunk)
+    return True, pop_jpeg(s)
+
+
+def make_jpeg_decoder(device='cuda:0'):
+    """Return a function decoding JPEG bytes to a BGR frame (None on failure).
+
+    Decodes on the GPU with nvImageCodec when it is installed, so the CPU only
+    receives the finished pixels, otherwise with cv2.imdecode.
+    """
+    def decode_cpu(jpg):
+        return cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    if nvimgcodec is None or torch is None or not torch.cuda.is_available():
+        return decode_cpu
+    decoder = nvimgcodec.Decoder()
+
+    def decode_gpu(jpg):
+        img = decoder.decode(jpg)  # RGB, HWC on the GPU
+        if img is None:
+            return decode_cpu(jpg)
+        return torch.as_tensor(img, device=device).flip(-1).cpu().numpy()
+
+    return decode_gpu
+
+
+def start_readers(streams, device='cuda:0'):
+    """Fetch and decode the frames of all open streams in the background.
+
+    One I/O thread select()s over the sockets and receives only from those that have
+    data, so a slow camera never holds up the others. The newest JPEG of each camera
+    is handed to that camera's decode thread, so decoding never delays the receives.
+
+    Frames go to s['queue'], which holds only the newest frame (a new one replaces
+    a frame not yet taken), so detection never runs on a stale frame; None is queued
+    when the stream ends or fails.
+    """
+    by_sock = {}
+    for s in streams:
+        if s['sock'] is None:
+            continue
+        s['queue'] = queue.Queue(maxsize=1)
+        s['jpegs'] = queue.Queue(maxsize=1)  # newest JPEG not yet decoded
+        s['ended'] = threading.Event()
+        by_sock[s['sock']] = s
+        threading.Thread(target=_decode_loop, args=(s, device), name=f"decode_{s['name']}",
+                         daemon=True).start()
+
+    def end_stream(sock, s):
+        del by_sock[sock]
+        s['ended'].set()
+        put_latest(s['jpegs'], None)
+
+    def reader():
+        while by_sock:
+            try:
+                readable, _, _ = select.select(list(by_sock), [], [])
+            except (OSError, ValueError):  # sockets closed on shutdown
+                return
+            for sock in readable:
+                s = by_sock[sock]
+                if s['ended'].is_set():  # its decoder failed
+                    end_stream(sock, s)
+                    continue
+                try:
+                    # Drain what has arrived and pass on only the newest frame
+                    jpg = None
+                    while True:
+                        ret, newer = read_http_frame(s)
+                        if not ret or newer is None:
+                            break
+                        jpg = newer
+                    if jpg is not None:
+                        put_latest(s['jpegs'], jpg)
+                except Exception as e:
+                    print(f"Error reading {s['name']}: {e}")
+                    ret = False
+                if not ret:
+                    end_stream(sock, s)
+
+    threading.Thread(target=reader, name="stream_reader", daemon=True).start()
+
+
+def _decode_loop(s, device):
+    decode_jpeg = make_jpeg_decoder(device)  # one decoder per thread
+    while True:
+        jpg = s['jpegs'].get()
+        if jpg is None:
+            break
+        try:
+            frame = decode_jpeg(jpg)
+        except Exception as e:
+            print(f"Error decoding {s['name']}: {e}")
+            s['ended'].set()
+            break
+        if frame is not None:
+            put_latest(s['queue'], frame)
+    put_latest(s['queue'], None)
+
+
+def render_label(text, font_scale=LABEL_FONT_SCALE, color=(0, 255, 0), thickness=2):
+    """Rasterize a label once; returns (color * alpha, 1 - alpha, ascent) for draw_label.
+
+    The alpha is the text coverage, so smoothed glyph edges blend like cv2.putText's.
+    """
+    (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+    coverage = np.zeros((h + baseline + 2 * LABEL_PAD, w + 2 * LABEL_PAD), dtype=np.uint8)
+    cv2.putText(coverage, text, (LABEL_PAD, h + LABEL_PAD), cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale, 255, thickness)
+    alpha = coverage[..., None].astype(np.float32) / 255
+    return alpha * np.float32(color) + 0.5, 1 - alpha, h + LABEL_PAD
+
+
+def make_label_images(names, font_scale=LABEL_FONT_SCALE):
+    """Pre-render the labels of the detected classes in confidence buckets of 0.05."""
+    return {(cls, bucket): render_label(f"{names[cls]} {bucket / 100:.2f}", font_scale)
+            for cls in PREDICT_ARGS['classes'] for bucket in range(0, 101, 5)}
+
+
+def draw_label(img, label_imgs, names, cls, conf, x, y, font_scale=LABEL_FONT_SCALE):
+    """Draw the label of a box with its text origin at (x, y).
+
+    Blends the pre-rendered text into the frame; labels missing from the cache or
+    crossing the frame border are rasterized with cv2.putText.
+    """
+    cached = label_imgs.get((cls, int(conf * 20) * 5))
+    if cached is not None:
+        label, inv_alpha, ascent = cached
+        top, left = y - ascent, x - LABEL_PAD
+        h, w = inv_alpha.shape[:2]
+        if top >= 0 and left >= 0 and top + h <= img.shape[0] and left + w <= img.shape[1]:
+            roi = img[top:top + h, left:left + w]
+            roi[...] = roi * inv_alpha + label
+            return
+    cv2.putText(img, f"{names[cls]} {conf:.2f}", (x, y), cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale, (0, 255, 0), 2)
+
+
+def load_model(weights='yolov8s.pt', device='cuda:0', batch=2, imgsz=IMGSZ):
+    """Load the detector as a TensorRT FP16 engine, exporting it next to the weights once.
+
+    The engine has a dynamic batch axis up to `batch` (one frame per camera) and is
+    warmed up at the runtime batch sizes. Falls back to the PyTorch weights if the
+    export fails (e.g. TensorRT is not installed).
+    """
+    from ultralytics import YOLO
+
+    engine = os.path.splitext(weights)[0] + '.engine'
+    if not os.path.exists(engine):
+        try:
+            YOLO(weights).export(format='engine', half=True, dynamic=True, batch=batch, imgsz=imgsz,
+                                 workspace=4, simplify=True, device=device)
+        except Exception as e:
+            print(f"TensorRT export failed ({e}), using PyTorch weights")
+            model = YOLO(weights)
+            model.to(device)
+            return model
+    model = YOLO(engine, task='detect')
+    dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+    for n in (1, batch, batch):
+        model.predict([dummy] * n, verbose=False, device=device, imgsz=imgsz)
+    return model
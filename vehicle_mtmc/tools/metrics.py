@@ -1,3 +1,5 @@
+import math
+
 import numpy as np
 
 
@@ -22,4 +24,13 @@ def euclidean_dist(v1: np.ndarray, v2: np.ndarray):
 def cosine_sim(v1: np.ndarray, v2: np.ndarray, already_normed=False):
     if already_normed:
         return np.dot(v1, v2)
-    return np.dot(v1, v2) / np.linalg.norm(v1, 2) / np.linalg.norm(v2, 2)
+    # squared norms as plain dot products, one sqrt for both
+    return float(v1 @ v2) / (math.sqrt(float(v1 @ v1) * float(v2 @ v2)) + 1e-12)
+
+def cosine_sim_matrix(a: np.ndarray, b: np.ndarray, already_normed=False):
+    """Pairwise cosine similarities between the rows of a (N x D) and b (M x D) as an N x M matrix."""
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    if not already_normed:
+        a = a / (np.sqrt(np.einsum('ij,ij->i', a, a))[:, None] + 1e-12)
+        b = b / (np.sqrt(np.einsum('ij,ij->i', b, b))[:, None] + 1e-12)
+    return a @ b.T
@@ -1,4 +1,5 @@
 import time
+import queue
 import argparse
 from collections import deque
 import numpy as np
@@ -15,6 +16,19 @@ def parse_args(description):
     return parser.parse_args()
 
 
+def put_latest(q, item):
+    """Put item on a bounded queue, dropping the oldest entries to make room."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
 class FrameRateCounter:
     def __init__(self, window=5):
         self.timestamps = deque()